@@ -0,0 +1,17 @@
+"""
+_logging.py
+-----------
+Single place that configures root logging for the package's entry points.
+"""
+
+import logging
+
+LOG_FORMAT = "%(asctime)s %(levelname)s:%(name)s:%(message)s"
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Install the default handler once; leave existing configuration alone."""
+    root = logging.getLogger()
+    if root.hasHandlers():
+        return
+    logging.basicConfig(level=level, format=LOG_FORMAT)
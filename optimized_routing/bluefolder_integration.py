@@ -5,9 +5,11 @@ Integration layer between BlueFolder API and routing extensions.
 Rate-limit safe version.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timezone
 import logging
 import os
+import random
 import time
 import xml.etree.ElementTree as ET
 import re
@@ -19,40 +21,90 @@ except ImportError:
     def load_dotenv(*args, **kwargs):
         return None
 try:
-    from requests.exceptions import HTTPError
+    from requests.exceptions import ConnectionError as RequestsConnectionError, HTTPError, Timeout
+    TRANSIENT_ERRORS = (RequestsConnectionError, Timeout, ConnectionError, TimeoutError)
 except ImportError:
     class HTTPError(Exception):
         def __init__(self, response=None):
             self.response = response
             super().__init__("HTTPError")
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+try:
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    Session = HTTPAdapter = None
 
 from bluefolder_api.client import BlueFolderClient
 from optimized_routing.utils.cache_manager import CacheManager
+from optimized_routing.utils.single_flight import SingleFlight
 from optimized_routing.config import settings
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 MAX_429_RETRIES = 5
+MAX_TRANSIENT_RETRIES = 3
+TRANSIENT_BACKOFF_SECONDS = 0.5
+XML_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Shared across every user processed in a run so concurrent workers read and
+# write one copy instead of clobbering each other's cache files.
+sr_cache = CacheManager("service_requests", ttl_minutes=60)
+loc_cache = CacheManager("locations", ttl_minutes=120)
+
+# User records change rarely; reuse them across back-to-back CLI runs.
+users_cache = CacheManager("active_users", ttl_minutes=5)
+origin_cache = CacheManager("user_origins", ttl_minutes=5)
+
+# Technicians often share service requests; collapse simultaneous lookups.
+_lookups = SingleFlight()
 
 # ======================================================================
 # RATE-LIMIT PROTECTION
 # ======================================================================
 
 
+def _transient_backoff(attempt: int, response=None) -> float:
+    """Exponential backoff with jitter, deferring to a numeric Retry-After header."""
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(float(headers.get("Retry-After")), 0.0)
+    except (TypeError, ValueError):
+        pass
+    base = TRANSIENT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    return base + random.uniform(0, TRANSIENT_BACKOFF_SECONDS)
+
+
 def bluefolder_safe(fn):
-    """Catch BlueFolder 429 responses and retry automatically."""
+    """
+    Catch BlueFolder 429 responses and retry automatically.
+    Connection resets, timeouts and 5xx responses get a short exponential
+    backoff (MAX_TRANSIENT_RETRIES) before the call is given up on.
+    """
 
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        """Retry the wrapped SDK call until it succeeds or a non-429 error occurs."""
+        """Retry the wrapped SDK call until it succeeds or a non-retryable error occurs."""
         attempts = 0
+        transient = 0
         while attempts < MAX_429_RETRIES:
             try:
                 return fn(*args, **kwargs)
 
             except HTTPError as e:
                 response = e.response
-                if not response or response.status_code != 429:
+                # requests.Response is falsy for error statuses; test for None explicitly.
+                status = getattr(response, "status_code", None)
+                if status is not None and status >= 500 and transient < MAX_TRANSIENT_RETRIES:
+                    transient += 1
+                    delay = _transient_backoff(transient, response)
+                    logger.warning(
+                        "[RETRY] %s returned %s; retrying in %.1fs (%d/%d)",
+                        fn.__name__, status, delay, transient, MAX_TRANSIENT_RETRIES,
+                    )
+                    time.sleep(delay)
+                    continue
+                if response is None or status != 429:
                     raise
 
                 attempts += 1
@@ -76,13 +128,34 @@ def bluefolder_safe(fn):
                     pass
 
                 logger.warning(
-                    f"[RATE LIMIT] 429 received; sleeping {wait_seconds:.1f}s… ({attempts}/{MAX_429_RETRIES})"
+                    "[RATE LIMIT] 429 received; sleeping %.1fs… (%s/%s)",
+                    wait_seconds,
+                    attempts,
+                    MAX_429_RETRIES,
                 )
                 time.sleep(wait_seconds)
 
+            except TRANSIENT_ERRORS as e:
+                if transient >= MAX_TRANSIENT_RETRIES:
+                    logger.exception(
+                        "[ERROR] BlueFolder operation failed in %s: %s",
+                        fn.__name__,
+                        e,
+                    )
+                    return None
+                transient += 1
+                delay = _transient_backoff(transient)
+                logger.warning(
+                    "[RETRY] %s failed (%s); retrying in %.1fs (%d/%d)",
+                    fn.__name__, e, delay, transient, MAX_TRANSIENT_RETRIES,
+                )
+                time.sleep(delay)
+
             except Exception as e:
                 logger.exception(
-                    f"[ERROR] BlueFolder operation failed in {fn.__name__}: {e}"
+                    "[ERROR] BlueFolder operation failed in %s: %s",
+                    fn.__name__,
+                    e,
                 )
                 return None
 
@@ -92,6 +165,41 @@ def bluefolder_safe(fn):
     return wrapper
 
 
+# ======================================================================
+# STREAMING XML PARSER
+# ======================================================================
+
+
+def _stream_xml_records(resp, tag: str) -> list[dict]:
+    """
+    Incrementally parse every `<tag>` element of an XML response into a dict.
+
+    Chunks are fed to an `XMLPullParser` as they arrive and each record is
+    cleared once extracted, so large payloads are never held as a full tree.
+    """
+    parser = ET.XMLPullParser(events=("end",))
+    if hasattr(resp, "iter_content"):
+        chunks = resp.iter_content(XML_STREAM_CHUNK_SIZE)
+    else:
+        chunks = (resp.content,)
+
+    records = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag != tag:
+                continue
+            records.append(
+                {
+                    child.tag: (child.text or "").strip() if child.text else None
+                    for child in elem
+                }
+            )
+            elem.clear()
+    parser.close()
+    return records
+
+
 # ======================================================================
 # CLASS: BlueFolderIntegration
 # ======================================================================
@@ -107,27 +215,30 @@ class BlueFolderIntegration:
         If no client is provided, we try to honor a configured base_url so
         deployments with vanity BlueFolder subdomains work without code changes.
         """
-        if client:
-            self.client = client
-            return
+        self.client = client or self._build_client(base_url)
+        self._tune_session()
 
+    @staticmethod
+    def _build_client(base_url: str | None) -> BlueFolderClient:
+        """Construct an SDK client, honoring a custom base URL where supported."""
         base_url = (base_url or settings.bluefolder_base_url or "").rstrip("/")
         client_kwargs = {}
         if base_url:
             client_kwargs["base_url"] = base_url
 
         try:
-            self.client = BlueFolderClient(**client_kwargs)
+            client = BlueFolderClient(**client_kwargs)
             if base_url:
                 logger.info("[BF] Using custom base URL: %s", base_url)
+            return client
         except TypeError:
             # Older SDKs may not accept kwargs; try positional, then fallback.
             try:
                 if base_url:
-                    self.client = BlueFolderClient(base_url)
+                    client = BlueFolderClient(base_url)
                     logger.info("[BF] Using custom base URL (positional): %s", base_url)
-                else:
-                    self.client = BlueFolderClient()
+                    return client
+                return BlueFolderClient()
             except Exception as exc:  # pragma: no cover - defensive
                 # Last resort: parse subdomain from base_url and set env for legacy client
                 parsed_account = None
@@ -146,7 +257,26 @@ class BlueFolderIntegration:
                 else:
                     logger.warning("[BF] Could not set base URL (%s); falling back to defaults: %s", base_url, exc)
 
-                self.client = BlueFolderClient()
+                return BlueFolderClient()
+
+    def _tune_session(self) -> None:
+        """
+        Size the SDK's shared HTTP pool for concurrent workers so keep-alive
+        connections are reused instead of reopened once the default pool fills.
+        """
+        session = getattr(self.client, "session", None)
+        if HTTPAdapter is None or not isinstance(session, Session):
+            return
+        pool_size = max(10, settings.routing_concurrency * 2)
+        # Keep whatever retry policy the SDK configured on its own adapter.
+        existing = session.get_adapter("https://")
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=getattr(existing, "max_retries", 0),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
 
     # ==================================================================
     # SAFE HELPERS WRAPPING ALL SDK CALLS
@@ -230,10 +360,12 @@ class BlueFolderIntegration:
             start_date = f"{today} 12:00 AM"
             end_date = f"{today} 11:59 PM"
 
-        logger.info(f"Fetching assignments {start_date} → {end_date} (type={date_range_type})")
-
-        sr_cache = CacheManager("service_requests", ttl_minutes=60)
-        loc_cache = CacheManager("locations", ttl_minutes=120)
+        logger.info(
+            "Fetching assignments %s → %s (type=%s)",
+            start_date,
+            end_date,
+            date_range_type,
+        )
 
         assignments = self._safe_assignments_for_user(
             user_id=user_id,
@@ -245,6 +377,8 @@ class BlueFolderIntegration:
             return []
 
         enriched = []
+        sr_updates: dict = {}
+        loc_updates: dict = {}
 
         for a in assignments:
             sr_id = a.get("serviceRequestId")
@@ -252,9 +386,9 @@ class BlueFolderIntegration:
                 continue
 
             # ---- Service Request
-            sr_data = sr_cache.get(sr_id)
+            sr_data = sr_updates.get(sr_id) or sr_cache.get(sr_id)
             if not sr_data:
-                sr_xml = self._safe_get_sr(sr_id)
+                sr_xml = _lookups.do(("sr", sr_id), lambda: self._safe_get_sr(sr_id))
                 if not sr_xml:
                     continue
 
@@ -271,16 +405,19 @@ class BlueFolderIntegration:
                         or "Unlabeled Service Request"
                     ),
                 }
-                sr_cache.set(sr_id, sr_data)
+                sr_updates[sr_id] = sr_data
 
             # ---- Location
             cust = sr_data.get("customerId")
             loc_id = sr_data.get("locationId")
             loc_key = f"{cust}:{loc_id}"
-            loc_data = loc_cache.get(loc_key)
+            loc_data = loc_updates.get(loc_key) or loc_cache.get(loc_key)
 
             if not loc_data and cust and loc_id:
-                loc_xml = self._safe_get_location(cust, loc_id)
+                loc_xml = _lookups.do(
+                    ("location", loc_key),
+                    lambda: self._safe_get_location(cust, loc_id),
+                )
                 if loc_xml:
                     loc = loc_xml.find(".//customerLocation")
                     if loc is not None:
@@ -290,7 +427,7 @@ class BlueFolderIntegration:
                             "state": loc.findtext("addressState"),
                             "zip": loc.findtext("addressPostalCode"),
                         }
-                        loc_cache.set(loc_key, loc_data)
+                        loc_updates[loc_key] = loc_data
 
             enriched.append(
                 {
@@ -307,8 +444,12 @@ class BlueFolderIntegration:
                 }
             )
 
+        sr_cache.set_many(sr_updates)
+        loc_cache.set_many(loc_updates)
         logger.info(
-            f"[CACHE] saved: {len(sr_cache.data)} SRs, {len(loc_cache.data)} locations"
+            "[CACHE] saved: %s SRs, %s locations",
+            len(sr_cache.data),
+            len(loc_cache.data),
         )
         return enriched
 
@@ -328,26 +469,20 @@ class BlueFolderIntegration:
             <userList><listType>full</listType></userList>
         </request>"""
 
-        resp = self.client.session.post(
+        # Streamed responses hold their connection until closed; release it on
+        # every exit so bluefolder_safe retries don't leak one per attempt.
+        with self.client.session.post(
             url,
             data=xml_payload.encode(),
             headers={"Content-Type": "application/xml"},
             auth=(self.client.api_key, "x"),
             timeout=30,
-        )
-        resp.raise_for_status()
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+            users = _stream_xml_records(resp, "user")
 
-        root = ET.fromstring(resp.text)
-        users = []
-        for u in root.findall(".//user"):
-            users.append(
-                {
-                    child.tag: (child.text or "").strip() if child.text else None
-                    for child in u
-                }
-            )
-
-        logger.info(f"[USERS] listType=full -> {len(users)} users")
+        logger.info("[USERS] listType=full -> %s users", len(users))
         return users
 
     # ==================================================================
@@ -390,7 +525,7 @@ class BlueFolderIntegration:
             if u.get("userId") == uid or u.get("id") == uid:
                 return u
 
-        logger.warning(f"[USERS] No user found with ID {user_id}")
+        logger.warning("[USERS] No user found with ID %s", user_id)
         return None
 
     # ==================================================================
@@ -399,12 +534,17 @@ class BlueFolderIntegration:
 
     def get_active_users(self) -> list[dict]:
         """Return the list of active users, with fallbacks if the SDK call fails."""
+        cached = users_cache.get("active")
+        if cached:
+            return cached
+
         users = self._safe_users_active()
         if users:
             for u in users:
                 if "userId" not in u and "id" in u:
                     u["userId"] = u["id"]
-            logger.info(f"[USERS] Retrieved {len(users)} active users via SDK.")
+            logger.info("[USERS] Retrieved %s active users via SDK.", len(users))
+            users_cache.set("active", users)
             return users
 
         # fallback
@@ -413,9 +553,23 @@ class BlueFolderIntegration:
         for u in actives:
             if "userId" not in u and "id" in u:
                 u["userId"] = u["id"]
-        logger.info(f"[USERS] Retrieved {len(actives)} active users (fallback).")
+        logger.info("[USERS] Retrieved %s active users (fallback).", len(actives))
+        if actives:
+            users_cache.set("active", actives)
         return actives
 
+    def get_active_user(self, user_id) -> dict | None:
+        """
+        Return one active user by id, or None if the user is not active.
+        The id index is rebuilt only when the active list itself changes.
+        """
+        users = self.get_active_users()
+        index = getattr(self, "_active_index", None)
+        if index is None or index[0] is not users:
+            index = (users, {str(u.get("userId")): u for u in users})
+            self._active_index = index
+        return index[1].get(str(user_id))
+
     # ==================================================================
     # CUSTOM FIELD UPDATE
     # ==================================================================
@@ -439,27 +593,116 @@ class BlueFolderIntegration:
                 "CustomFields": {"CustomField": {"Name": name, "Value": field_value}},
             }
 
-            logger.info(f"[USERS] Sending update payload: {payload}")
+            logger.info("[USERS] Sending update payload: %s", payload)
 
             # SDK ONLY supports: update(dict)
             result = self._safe_users_update(payload)
 
-            logger.info(f"[USERS] Updated {name} for user {user_id}")
+            logger.info("[USERS] Updated %s for user %s", name, user_id)
             return result
 
         except Exception as e:
             logger.exception(
-                f"[USERS] Failed to update custom field for {user_id}: {e}"
+                "[USERS] Failed to update custom field for %s: %s",
+                user_id,
+                e,
             )
             return None
 
+    def update_user_custom_fields_bulk(
+        self, updates: dict[int, str], field_name: str = None, max_workers: int | None = None
+    ) -> dict[int, object]:
+        """
+        Write one custom-field value per user and return `{user_id: result}`.
+        The SDK has no batch endpoint, so writes are issued concurrently on a
+        small pool; 429s are still absorbed per call by `bluefolder_safe`.
+        """
+        if not updates:
+            return {}
+
+        workers = max(1, min(max_workers or settings.routing_concurrency, len(updates)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bf-update") as pool:
+            results = pool.map(
+                lambda item: self.update_user_custom_field(item[0], item[1], field_name),
+                updates.items(),
+            )
+            return dict(zip(updates, results))
+
     # ==================================================================
     # ORIGIN ADDRESS BUILDER
     # ==================================================================
 
     def get_user_origin_address(self, user_id):
         """Assemble a user origin address preferring work location over home."""
-        u = self.get_user(user_id)
+        cached = origin_cache.get(user_id)
+        if cached:
+            return cached
+
+        origin = self._origin_from_user(self.get_user(user_id))
+        if origin:
+            origin_cache.set(user_id, origin)
+        return origin
+
+    def get_user_origins_bulk(self, user_ids) -> dict[int, str]:
+        """
+        Resolve origin addresses for many users at once.
+        Cache misses are filled from a single full user-list call instead of
+        one lookup per user; users the list call doesn't cover (including all
+        of them if it fails) fall back to `get_user_origin_address`. Users
+        without an address are omitted.
+        """
+        origins: dict[int, str] = {}
+        missing: set[str] = set()
+        for uid in user_ids:
+            cached = origin_cache.get(uid)
+            if cached:
+                origins[int(uid)] = cached
+            else:
+                missing.add(str(uid))
+
+        if not missing:
+            return origins
+
+        requested = len(origins) + len(missing)
+        try:
+            users = self.list_users_full() or []
+        except Exception as e:
+            logger.warning("[USERS] Full user list failed (%s); looking up origins per user.", e)
+            users = []
+
+        fetched: dict[int, str] = {}
+        listed: set[str] = set()
+        for u in users:
+            uid = u.get("userId") or u.get("id")
+            if uid not in missing:
+                continue
+            listed.add(uid)
+            origin = self._origin_from_user(u)
+            if origin:
+                fetched[int(uid)] = origin
+
+        origin_cache.set_many(fetched)
+        origins.update(fetched)
+
+        unlisted = sorted(missing - listed)
+        if unlisted:
+            workers = max(1, min(settings.routing_concurrency, len(unlisted)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bf-origin") as pool:
+                for uid, origin in zip(unlisted, pool.map(self.get_user_origin_address, unlisted)):
+                    if origin:
+                        origins[int(uid)] = origin
+
+        logger.info(
+            "[USERS] Resolved %s of %s origins (%s via per-user lookup).",
+            len(origins),
+            requested,
+            len(unlisted),
+        )
+        return origins
+
+    @staticmethod
+    def _origin_from_user(u: dict | None) -> str | None:
+        """Build an origin string from a user record's work or home address."""
         if not u:
             return None
 
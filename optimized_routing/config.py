@@ -57,9 +57,16 @@ class Settings(BaseModel):
     )
 
     cf_shortener_url: str = Field(default_factory=lambda: os.getenv("CF_SHORTENER_URL", ""))
+    # Open one Geoapify TLS connection in the background when the first manager is built.
+    geoapify_warmup: bool = Field(
+        default_factory=lambda: os.getenv("GEOAPIFY_WARMUP", "").lower() in {"1", "true", "yes"}
+    )
 
     default_origin: str = Field(default_factory=lambda: os.getenv("DEFAULT_ORIGIN", "South Paris, ME"))
     default_provider: str = Field(default_factory=lambda: os.getenv("DEFAULT_PROVIDER", "geoapify").lower())
+    routing_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("ROUTING_CONCURRENCY", "4")), gt=0, validate_default=True
+    )
 
     @validator("default_provider", pre=True, always=True)
     def validate_default_provider(cls, v):
@@ -3,26 +3,28 @@ Main CLI entry point for Optimized Routing Extension.
 """
 
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
+from functools import partial
 import argparse
 import uuid
 
 from optimized_routing.bluefolder_integration import BlueFolderIntegration
 from optimized_routing.routing import (
+    _manager_for_provider,
     generate_route_for_provider,
-    shorten_route_url,
+    shorten_route_urls,
     preview_user_stops,
 )
 
+from optimized_routing._logging import configure_logging
 from optimized_routing.config import settings, VALID_PROVIDERS
 
 # -------------------------------------------------------------------
 # Logging
 # -------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s:%(name)s:%(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -52,31 +54,160 @@ def resolve_relative_date(relative: str) -> tuple[str, str]:
 # Routing Manager Factory
 # -------------------------------------------------------------------
 def get_routing_manager(provider: str, origin: str, destination: str | None):
-    provider = provider.lower()
+    """Instantiate the manager for `provider`; its module is imported only now."""
+    manager_cls = _manager_for_provider(provider)
+    return manager_cls(origin=origin, destination_override=destination)
 
-    if provider == "geoapify":
-        from optimized_routing.manager.geoapify_manager import GeoapifyRoutingManager
 
-        return GeoapifyRoutingManager(
-            origin=origin,
-            destination_override=destination,
-        )
-    elif provider == "mapbox":
-        from optimized_routing.manager.mapbox_manager import MapboxRoutingManager
+# -------------------------------------------------------------------
+# PER-USER WORKER
+# -------------------------------------------------------------------
+def process_user(
+    bf: BlueFolderIntegration,
+    user: dict,
+    *,
+    run_id: str,
+    provider: str,
+    origin: str | None = None,
+    origin_override: str | None = None,
+    destination_override: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    date_range_type: str = "scheduled",
+) -> str | None:
+    """
+    Fetch assignments and build the long route URL for a single user.
+    `origin` is the user's resolved origin (see get_user_origins_bulk).
+    Returns None when the user has nothing to route or routing failed.
+    """
+    uid = int(user["userId"])
+    name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
+    log_prefix = f"[run={run_id} provider={provider} user={uid}]"
+
+    logger.info("---- Processing %s (ID: %s) %s ----", name, uid, log_prefix)
+
+    # Resolve origin; allow routing layer to apply its own default if missing.
+    origin = origin_override or origin
+    if origin_override:
+        logger.info("%s [ORIGIN] Using CLI overridden origin: %s", log_prefix, origin_override)
+    elif origin:
+        logger.info("%s [ORIGIN] Using user-specific origin: %s", log_prefix, origin)
+    else:
+        logger.info("%s [ORIGIN] No origin found; using routing default inside generator.", log_prefix)
 
-        return MapboxRoutingManager(
-            origin=origin,
-            destination_override=destination,
-        )
-    elif provider == "osm":
-        from optimized_routing.manager.osm_manager import OSMRoutingManager
+    # Destination optional
+    destination = destination_override or None
 
-        return OSMRoutingManager(
-            origin=origin,
+    # Fetch assignments for the desired date range (defaults to today)
+    assignments = bf.get_user_assignments_range(
+        uid,
+        start_date=start_date,
+        end_date=end_date,
+        date_range_type=date_range_type,
+    )
+    if not assignments:
+        logger.info("%s [SKIP] No assignments for %s in range %s → %s", log_prefix, name, start_date, end_date)
+        return None
+
+    # Generate long route URL using selected provider
+    try:
+        long_url = generate_route_for_provider(
+            provider,
+            uid,
+            origin_address=origin,
             destination_override=destination,
+            assignments=assignments,
         )
-    else:
-        raise ValueError(f"Unknown provider '{provider}'")
+        logger.info("%s [ROUTE] Generated URL: %s", log_prefix, long_url)
+    except Exception as e:
+        logger.exception("%s [ERROR] Route generation failed: %s", log_prefix, e)
+        return None
+
+    return long_url
+
+
+# -------------------------------------------------------------------
+# PIPELINE LAYERS
+# -------------------------------------------------------------------
+def _route_layer(
+    users: list[dict],
+    worker,
+    origins: dict[int, str],
+    *,
+    workers: int,
+    run_id: str,
+) -> deque[tuple[dict, str]]:
+    """Run `worker` for every user concurrently; return (user, long_url) pairs."""
+    routes: deque[tuple[dict, str]] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route") as pool:
+        futures = {
+            pool.submit(worker, user, origin=origins.get(int(user["userId"]))): user
+            for user in users
+        }
+        for future in as_completed(futures):
+            user = futures[future]
+            try:
+                long_url = future.result()
+            except Exception as e:
+                logger.exception(
+                    "[run=%s] [ERROR] Unhandled failure for user %s: %s",
+                    run_id,
+                    user.get("userId"),
+                    e,
+                )
+                continue
+            if long_url:
+                routes.append((user, long_url))
+    return routes
+
+
+def _shorten_layer(routes: deque[tuple[dict, str]], *, run_id: str) -> dict[str, str]:
+    """Shorten all long URLs from the route layer; failures fall back to long URLs."""
+    try:
+        return shorten_route_urls(long_url for _, long_url in routes)
+    except Exception as e:
+        logger.exception("[run=%s] [ERROR] Shortener failed: %s", run_id, e)
+        return {}
+
+
+def _update_layer(
+    bf: BlueFolderIntegration,
+    routes: deque[tuple[dict, str]],
+    shorts: dict[str, str],
+    *,
+    run_id: str,
+    provider: str,
+    dry_run: bool,
+    max_workers: int | None,
+) -> None:
+    """
+    Publish each user's short URL to BlueFolder (skipped on dry runs).
+    `routes` and `shorts` are drained as they are consumed so only the short
+    URLs stay alive through the bulk update.
+    """
+    pending_updates: dict[int, str] = {}
+    while routes:
+        user, long_url = routes.popleft()
+        uid = int(user["userId"])
+        name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
+        log_prefix = f"[run={run_id} provider={provider} user={uid}]"
+        short = shorts.get(long_url, long_url)
+        logger.info("%s [SHORT] %s → %s", log_prefix, long_url[:60], short)
+
+        if dry_run:
+            logger.info("%s [DRY RUN] Skipping BlueFolder update for %s", log_prefix, name)
+            continue
+        pending_updates[uid] = short
+    shorts.clear()
+
+    if not pending_updates:
+        return
+    try:
+        results = bf.update_user_custom_fields_bulk(pending_updates, max_workers=max_workers)
+        for uid in results:
+            logger.info("[run=%s provider=%s user=%s] [DONE] Updated route URL", run_id, provider, uid)
+    except Exception as e:
+        logger.error("[run=%s] [ERROR] BF bulk update failed: %s", run_id, e)
 
 
 # -------------------------------------------------------------------
@@ -91,89 +222,71 @@ def run_daily_routing(
     start_date: str | None = None,
     end_date: str | None = None,
     date_range_type: str = "scheduled",
+    max_workers: int | None = None,
+    bf: BlueFolderIntegration | None = None,
 ):
-    """Main runner for routing job."""
+    """
+    Main runner for routing job.
+
+    Work runs as three dependent layers, each fully concurrent across users:
+    build routes → shorten URLs → update BlueFolder. A layer starts once the
+    previous one finishes, so wall-clock is roughly the sum of three layer
+    durations rather than three round-trips per user.
+    """
 
     provider = (provider or settings.default_provider).lower()
     run_id = uuid.uuid4().hex[:8]
     logger.info("[START] Route generation job %s at %s", run_id, datetime.now())
 
-    bf = BlueFolderIntegration()
+    # Resolve the default (today) range once so every user, routed concurrently,
+    # fetches the same day even if the run crosses midnight.
+    if not start_date or not end_date:
+        start_date, end_date = resolve_relative_date("today")
+
+    bf = bf or BlueFolderIntegration()
 
     # --- Select users ---
     if user_override:
-        logger.info(f"[CLI] Running routing ONLY for user {user_override}")
-        all_users = bf.get_active_users()
-        users = [u for u in all_users if str(u.get("userId")) == str(user_override)]
+        logger.info("[CLI] Running routing ONLY for user %s", user_override)
+        user = bf.get_active_user(user_override)
+        users = [user] if user else []
         if not users:
-            logger.error(f"[ERROR] User {user_override} not found in active list.")
+            logger.error("[ERROR] User %s not found in active list.", user_override)
             return
     else:
         users = bf.get_active_users()
 
-    # --- Loop users ---
-    for user in users:
-        uid = int(user["userId"])
-        name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
-        log_prefix = f"[run={run_id} provider={provider} user={uid}]"
-
-        logger.info(f"---- Processing {name} (ID: {uid}) {log_prefix} ----")
-
-        # Resolve origin; allow routing layer to apply its own default if missing.
-        origin = origin_override or bf.get_user_origin_address(uid)
-        if origin_override:
-            logger.info("%s [ORIGIN] Using CLI overridden origin: %s", log_prefix, origin_override)
-        elif origin:
-            logger.info("%s [ORIGIN] Using user-specific origin: %s", log_prefix, origin)
-        else:
-            logger.info("%s [ORIGIN] No origin found; using routing default inside generator.", log_prefix)
-
-        # Destination optional
-        destination = destination_override or None
-
-        # Fetch assignments for the desired date range (defaults to today)
-        assignments = bf.get_user_assignments_range(
-            uid,
-            start_date=start_date,
-            end_date=end_date,
-            date_range_type=date_range_type,
-        )
-        if not assignments:
-            logger.info("%s [SKIP] No assignments for %s in range %s → %s", log_prefix, name, start_date, end_date)
-            continue
-
-        # Select provider manager
-        # Generate long route URL using selected provider
-        try:
-            long_url = generate_route_for_provider(
-                provider,
-                uid,
-                origin_address=origin,
-                destination_override=destination,
-                assignments=assignments,
-            )
-            logger.info("%s [ROUTE] Generated URL: %s", log_prefix, long_url)
-        except Exception as e:
-            logger.exception("%s [ERROR] Route generation failed: %s", log_prefix, e)
-            continue
-
-        # Shorten
-        try:
-            short = shorten_route_url(long_url)
-            logger.info("%s [SHORT] %s → %s", log_prefix, long_url[:60], short)
-        except Exception as e:
-            logger.exception("%s [ERROR] Shortener failed: %s", log_prefix, e)
-            short = long_url
-
-        # Update BlueFolder
-        if dry_run:
-            logger.info("%s [DRY RUN] Skipping BlueFolder update for %s", log_prefix, name)
-        else:
-            try:
-                bf.update_user_custom_field(uid, short)
-                logger.info("%s [DONE] Updated route URL for %s", log_prefix, name)
-            except Exception as e:
-                logger.error("%s [ERROR] BF update failed for %s: %s", log_prefix, name, e)
+    # Resolve every origin with one bulk lookup rather than one per user.
+    origins = {} if origin_override else bf.get_user_origins_bulk([int(u["userId"]) for u in users])
+
+    # --- Layer 0: build every route concurrently ---
+    worker = partial(
+        process_user,
+        bf,
+        run_id=run_id,
+        provider=provider,
+        origin_override=origin_override,
+        destination_override=destination_override,
+        start_date=start_date,
+        end_date=end_date,
+        date_range_type=date_range_type,
+    )
+    workers = max(1, min(max_workers or settings.routing_concurrency, len(users)))
+    routes = _route_layer(users, worker, origins, workers=workers, run_id=run_id)
+
+    # --- Layer 1: shorten every generated route in one batch ---
+    shorts = _shorten_layer(routes, run_id=run_id)
+
+    # --- Layer 2: update BlueFolder in one bulk pass ---
+    _update_layer(
+        bf,
+        routes,
+        shorts,
+        run_id=run_id,
+        provider=provider,
+        dry_run=dry_run,
+        max_workers=max_workers,
+    )
 
     logger.info("[FINISHED] Routing job complete [run=%s]", run_id)
 
@@ -181,22 +294,31 @@ def run_daily_routing(
 # -------------------------------------------------------------------
 # PREVIEW MODE HANDLER
 # -------------------------------------------------------------------
-def handle_preview_mode(args):
-    bf = BlueFolderIntegration()
+def handle_preview_mode(args, bf: BlueFolderIntegration | None = None):
+    bf = bf or BlueFolderIntegration()
 
     if args.preview_stops == "all":
         users = bf.get_active_users()
         print(f"\n=== PREVIEW MODE: Showing stops for {len(users)} users ===\n")
-        for u in users:
+        origins = bf.get_user_origins_bulk([int(u["userId"]) for u in users])
+
+        def render(u: dict) -> list[str]:
             uid = int(u["userId"])
-            origin = bf.get_user_origin_address(uid)
             name = f"{u.get('firstName')} {u.get('lastName')}"
-            print(f"\n#### PREVIEW {name} ({uid}) ####")
-            preview_user_stops(uid, origin=origin)
+            lines = [f"\n#### PREVIEW {name} ({uid}) ####"]
+            preview_user_stops(uid, origin=origins.get(uid), bf=bf, emit=lines.append)
+            return lines
+
+        # Previews are independent network-bound jobs; run them together and
+        # print each user's buffered block in the original order.
+        workers = max(1, min(settings.routing_concurrency, len(users)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview") as pool:
+            for lines in pool.map(render, users):
+                print("\n".join(lines))
     else:
         uid = int(args.preview_stops)
         origin = bf.get_user_origin_address(uid)
-        preview_user_stops(uid, origin=origin)
+        preview_user_stops(uid, origin=origin, bf=bf)
 
 
 # -------------------------------------------------------------------
@@ -213,9 +335,13 @@ def dispatch_cli(args):
         start_date, end_date = resolve_relative_date(relative_date)
 
     date_range_type = getattr(args, "date_range_type", "scheduled")
+
+    # One integration (and SDK connection pool) serves the whole command.
+    bf = BlueFolderIntegration()
+
     # PREVIEW MODE
     if args.preview_stops:
-        handle_preview_mode(args)
+        handle_preview_mode(args, bf=bf)
         return
 
     # SINGLE-USER MODE
@@ -229,6 +355,7 @@ def dispatch_cli(args):
             start_date=start_date,
             end_date=end_date,
             date_range_type=date_range_type,
+            bf=bf,
         )
 
     # FULL RUN
@@ -241,20 +368,23 @@ def dispatch_cli(args):
         start_date=start_date,
         end_date=end_date,
         date_range_type=date_range_type,
+        bf=bf,
     )
 
 
 # -------------------------------------------------------------------
-# __main__
+# ARGUMENT PARSER
 # -------------------------------------------------------------------
-def __main__():
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Optimized Routing Extension")
 
     parser.add_argument("--user", help="Run routing ONLY for this user ID")
     parser.add_argument("--origin", help="Override origin address")
     parser.add_argument("--destination", help="Override final destination")
     parser.add_argument(
-        "--provider", choices=sorted(VALID_PROVIDERS), default=settings.default_provider
+        "--provider",
+        choices=sorted(VALID_PROVIDERS),
+        help="Routing provider (default: DEFAULT_PROVIDER setting).",
     )
     parser.add_argument(
         "--date",
@@ -287,8 +417,18 @@ def __main__():
         default="scheduled",
         help="Which date field to filter on (default: scheduled).",
     )
+    return parser
+
+
+# Built once at import; the provider default is resolved from settings at dispatch time.
+_PARSER = _build_parser()
 
-    args = parser.parse_args()
+
+# -------------------------------------------------------------------
+# __main__
+# -------------------------------------------------------------------
+def __main__():
+    args = _PARSER.parse_args()
     dispatch_cli(args)
 
 
@@ -15,14 +15,89 @@ Extending this:
 from __future__ import annotations
 
 import logging
+import re
+import sys
+import unicodedata
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
-from enum import Enum, auto
-from typing import List
-from collections import defaultdict
+from hashlib import blake2b
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from operator import itemgetter
+from enum import Enum
+from typing import Callable, Iterable, List, Sequence, TypeVar
+
+from optimized_routing.utils.cache_manager import CacheManager
+from optimized_routing.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Provider-prefixed geocodes; an address's coordinates are effectively static.
+geocode_cache = CacheManager("geocode", ttl_minutes=60 * 24 * 30)
+# Provider optimization results keyed by the ordered input coordinates; recurring
+# stops produce the same coordinate sets day to day, so results live for 48 hours.
+route_cache = CacheManager("routes", ttl_minutes=48 * 60)
+# Technicians building at once often share stop sets; a cold key is fetched once.
+_inflight = SingleFlight()
+
+
+def cache_key(prefix: str, parts: Iterable[object]) -> str:
+    """Stable cross-process cache key (built-in hash() is salted per interpreter)."""
+    digest = blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f"{prefix}_{digest}"
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_COMMA_RE = re.compile(r"\s*,\s*")
+_COUNTRY_SUFFIX_RE = re.compile(r",\s*(?:usa|us|united states(?: of america)?)$")
+# USPS Publication 28 street suffixes and directionals, folded to the standard
+# abbreviation so "Main Street" and "Main St." share one geocode cache entry.
+_USPS_ABBREVIATIONS = {
+    "alley": "aly", "avenue": "ave", "av": "ave", "boulevard": "blvd", "circle": "cir",
+    "court": "ct", "drive": "dr", "expressway": "expy", "highway": "hwy", "lane": "ln",
+    "parkway": "pkwy", "place": "pl", "road": "rd", "route": "rte", "square": "sq",
+    "street": "st", "terrace": "ter", "trail": "trl",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+_USPS_WORD_RE = re.compile(
+    r"\b(%s)\b\.?" % "|".join(sorted({*_USPS_ABBREVIATIONS, *_USPS_ABBREVIATIONS.values()}, key=len, reverse=True))
+)
+
+
+def _usps_abbreviation(match: re.Match) -> str:
+    word = match.group(1)
+    return _USPS_ABBREVIATIONS.get(word, word)
+
+
+@lru_cache(maxsize=4096)
+def normalize_address(address: str) -> str:
+    """
+    Geocode cache key: unicode-folded, whitespace collapsed, commas spaced as
+    ", ", street suffixes/directionals folded to USPS abbreviations, trailing
+    punctuation and a trailing US country name dropped.
+    """
+    folded = _USPS_WORD_RE.sub(_usps_abbreviation, unicodedata.normalize("NFKD", address).casefold())
+    collapsed = _COMMA_RE.sub(", ", _WHITESPACE_RE.sub(" ", folded)).strip().rstrip(",.; ")
+    return _COUNTRY_SUFFIX_RE.sub("", collapsed).rstrip(",.; ")
+
+
+def reorder(items: Sequence[T], order: Sequence[int]) -> list[T]:
+    """Return `items` permuted by the index list `order`, indexing in C via itemgetter."""
+    if len(order) < 2:
+        # itemgetter with a single index returns the bare item, not a tuple.
+        return [items[i] for i in order]
+    return list(itemgetter(*order)(items))
+
+
+# Shared across managers so geocode threads are reused between route builds.
+_GEOCODE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="geocode")
+# Per-window / per-segment optimization calls. Kept apart from _GEOCODE_POOL so
+# a burst of geocodes never queues ahead of an optimization (or vice versa).
+_OPTIMIZE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="optimize")
+
 
 # ---------------------------------------------------------------------------
 # ENUMS
@@ -38,9 +113,10 @@ class RoutingProvider(Enum):
 class ServiceWindow(Enum):
     """Defines technician scheduling windows."""
 
-    AM = auto()  # 7 AM – 12 PM
-    PM = auto()  # 12 PM – 5 PM
-    ALL_DAY = auto()  # 8 AM – 4 PM
+    # Values are the routing priority (AM → ALL_DAY → PM), so `.value` sorts directly.
+    AM = 0  # 7 AM – 12 PM
+    ALL_DAY = 1  # 8 AM – 4 PM
+    PM = 2  # 12 PM – 5 PM
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +140,12 @@ class RouteStop:
     window: ServiceWindow
     label: str | None = None
     job_count: int = 1
+    _address_key: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Normalized (and interned) once so deduplication never re-strips/lowers
+        # and repeat addresses share one string object.
+        self._address_key = sys.intern(self.address.strip().lower())
 
 
 # ---------------------------------------------------------------------------
@@ -88,6 +170,8 @@ class BaseRoutingManager(ABC):
     destination_override: str | None = None
     stops: List[RouteStop] = field(default_factory=list)
     end_at_origin: bool = True
+    # Last deduplicate_stops() result; lets retried builds skip the fold.
+    _deduped: List[RouteStop] | None = field(default=None, init=False, repr=False, compare=False)
 
     # ----------------------------
     # Add / Manage Stops
@@ -95,9 +179,60 @@ class BaseRoutingManager(ABC):
 
     def add_stop(self, stop: RouteStop) -> None:
         self.stops.append(stop)
+        self._deduped = None
 
     def add_stops(self, stops: List[RouteStop]) -> None:
         self.stops.extend(stops)
+        self._deduped = None
+
+    @staticmethod
+    def _cached_geocode(provider: str, address: str, fetch: Callable[[str], T | None]) -> T | None:
+        """Serve `address` from the shared geocode cache, calling `fetch` and storing hits on a miss."""
+        key = f"{provider}:{normalize_address(address)}"
+        cached = geocode_cache.get(key)
+        if cached:
+            return cached
+        result = fetch(address)
+        if result:
+            geocode_cache.set(key, result)
+        return result
+
+    @staticmethod
+    def _cached_optimization(provider: str, coords: Sequence, fetch: Callable[[], T | None]) -> T | None:
+        """
+        Serve an optimization result for this exact coordinate sequence from
+        route_cache, calling `fetch` and storing non-empty results on a miss.
+        Concurrent misses for the same key share a single `fetch`.
+        """
+        key = cache_key(f"{provider}_opt", coords)
+        cached = route_cache.get(key)
+        if cached:
+            return cached
+
+        def fetch_and_store() -> T | None:
+            result = fetch()
+            if result:
+                route_cache.set(key, result)
+            return result
+
+        return _inflight.do(key, fetch_and_store)
+
+    @staticmethod
+    def _geocode_concurrently(geocode: Callable[[str], T], addresses: Iterable[str]) -> dict[str, T]:
+        """
+        Run `geocode` in parallel once per distinct normalized address and
+        return {address: result} for every non-empty input spelling.
+        """
+        variants: dict[str, list[str]] = {}
+        for addr in addresses:
+            if addr:
+                variants.setdefault(normalize_address(addr), []).append(addr)
+        results = _GEOCODE_POOL.map(geocode, [spellings[0] for spellings in variants.values()])
+        return {
+            addr: result
+            for spellings, result in zip(variants.values(), results)
+            for addr in spellings
+        }
 
     # ----------------------------
     # Abstract Interface
@@ -118,60 +253,81 @@ class BaseRoutingManager(ABC):
     # Ordering & Grouping
     # ----------------------------
 
-    def ordered_stops(self) -> List[RouteStop]:
-        priority = {
-            ServiceWindow.AM: 0,
-            ServiceWindow.ALL_DAY: 1,
-            ServiceWindow.PM: 2,
+    def _window_buckets(self) -> tuple[list[RouteStop], list[RouteStop], list[RouteStop]]:
+        """Split stops into (AM, ALL_DAY, PM) buckets in one stable pass."""
+        window = self.stops[0].window if self.stops else ServiceWindow.ALL_DAY
+        # Single-window routes (the common case) need no per-stop dispatch; the
+        # check bails at the first stop in another window.
+        if all(stop.window is window for stop in self.stops):
+            only = list(self.stops)
+            return (
+                only if window is ServiceWindow.AM else [],
+                only if window is ServiceWindow.ALL_DAY else [],
+                only if window is ServiceWindow.PM else [],
+            )
+
+        am: list[RouteStop] = []
+        all_day: list[RouteStop] = []
+        pm: list[RouteStop] = []
+        dispatch = {
+            ServiceWindow.AM: am.append,
+            ServiceWindow.ALL_DAY: all_day.append,
+            ServiceWindow.PM: pm.append,
         }
-        return sorted(self.stops, key=lambda s: priority[s.window])
+        for stop in self.stops:
+            dispatch[stop.window](stop)
+        return am, all_day, pm
+
+    def ordered_stops(self) -> List[RouteStop]:
+        am, all_day, pm = self._window_buckets()
+        return [*am, *all_day, *pm]
 
     def grouped_stops(self) -> list[list[RouteStop]]:
-        groups = {ServiceWindow.AM: [], ServiceWindow.PM: [], ServiceWindow.ALL_DAY: []}
-        for stop in self.ordered_stops():
-            groups[stop.window].append(stop)
-        return [
-            groups[w]
-            for w in [ServiceWindow.AM, ServiceWindow.ALL_DAY, ServiceWindow.PM]
-            if groups[w]
-        ]
+        return [group for group in self._window_buckets() if group]
 
     # ----------------------------
     # Deduplication
     # ----------------------------
 
     def deduplicate_stops(self) -> list[RouteStop]:
-        grouped = defaultdict(list)
+        # Builders assign the result back to self.stops; on a retry it is already unique.
+        if self._deduped is not None and self.stops is self._deduped:
+            return self._deduped
 
-        for stop in self.stops:
-            key = stop.address.strip().lower()
-            grouped[key].append(stop)
+        merged: dict[str, RouteStop] = {}
+        labels: dict[str, list[str]] = {}
 
-        unique_stops: list[RouteStop] = []
-        for key, stops in grouped.items():
-            if len(stops) == 1:
-                unique_stops.append(stops[0])
+        # Single pass: fold every repeat of an address into one accumulator.
+        for stop in self.stops:
+            key = stop._address_key
+            base = merged.get(key)
+            if base is None:
+                merged[key] = stop
                 continue
 
-            base = stops[0]
-            combined_labels = [s.label for s in stops if s.label]
-            base.label = ", ".join(combined_labels) if combined_labels else base.label
-            base.job_count = len(stops)
+            if key not in labels:
+                # First repeat: copy so the caller's RouteStop isn't mutated.
+                base = merged[key] = replace(base, job_count=1)
+                labels[key] = [base.label] if base.label else []
+
+            base.job_count += 1
+            if stop.label:
+                labels[key].append(stop.label)
+            if stop.window.value < base.window.value:
+                base.window = stop.window
 
-            window_priority = {
-                ServiceWindow.AM: 0,
-                ServiceWindow.ALL_DAY: 1,
-                ServiceWindow.PM: 2,
-            }
-            base.window = min(stops, key=lambda s: window_priority[s.window]).window
+        for key, combined_labels in labels.items():
+            base = merged[key]
+            base.label = f"{', '.join(combined_labels) or 'Jobs'} ({base.job_count} jobs)"
 
-            base.label = f"{base.label or 'Jobs'} ({base.job_count} jobs)"
-            unique_stops.append(base)
+        unique_stops = list(merged.values())
 
         if len(unique_stops) != len(self.stops):
             logger.info(
-                f"[ROUTING] Deduplicated {len(self.stops) - len(unique_stops)} redundant stops "
-                f"→ {len(unique_stops)} unique locations."
+                "[ROUTING] Deduplicated %s redundant stops → %s unique locations.",
+                len(self.stops) - len(unique_stops),
+                len(unique_stops),
             )
 
+        self._deduped = unique_stops
         return unique_stops
@@ -9,28 +9,93 @@ still producing a clickable set of driving directions.
 from __future__ import annotations
 
 import logging
+import math
 import os
+import threading
 import time
-from typing import List, Optional
-from urllib.parse import urlencode
-
-import requests
-
-from optimized_routing.manager.base import BaseRoutingManager, RouteStop
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+from optimized_routing.manager.base import (
+    _GEOCODE_POOL,
+    _OPTIMIZE_POOL,
+    BaseRoutingManager,
+    RouteStop,
+    normalize_address,
+    reorder,
+)
 from optimized_routing.utils.cache_manager import CacheManager
+from optimized_routing.utils.http import build_session
+from optimized_routing.utils.rate_limiter import TokenBucket
 from optimized_routing.config import settings
 
 logger = logging.getLogger(__name__)
 
 # Cache geocode lookups to reduce rate-limit pressure
 geocode_cache = CacheManager("geoapify_geocode", ttl_minutes=24 * 60)
+# Addresses Geoapify could not resolve; short TTL so corrected addresses recover quickly.
+geocode_miss_cache = CacheManager("geoapify_geocode_misses", ttl_minutes=60)
+
+# Shared by every manager in the process; stays under Geoapify's free-tier 5 req/s.
+GEOAPIFY_LIMITER = TokenBucket(rate=5, capacity=10)
+
+# One keep-alive pool shared by every manager, so geocode/matrix/trip calls reuse
+# TLS connections across routes; 429/5xx and connection errors are retried by urllib3.
+_SESSION = build_session(
+    pool_connections=16,
+    pool_maxsize=16,
+    retries=3,
+    backoff_factor=1.0,
+    allowed_methods=("GET", "POST"),
+)
+
+# Connection warm-up is opt-in (settings.geoapify_warmup) and runs once per process.
+_warmup_lock = threading.Lock()
+_warmed_up = False
+
+
+def _claim_warmup() -> bool:
+    """True for the first caller in this process, False for everyone after."""
+    global _warmed_up
+    with _warmup_lock:
+        if _warmed_up:
+            return False
+        _warmed_up = True
+        return True
+
+
+def _decode_json(resp):
+    """Decode a response body, via orjson when the speedups extra is installed."""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
 
 
 class GeoapifyRoutingManager(BaseRoutingManager):
     """Routing manager that leans on Geoapify for lookups."""
 
+    API_ROOT = "https://api.geoapify.com/"
     GEOCODE_URL = "https://api.geoapify.com/v1/geocode/search"
+    BATCH_GEOCODE_URL = "https://api.geoapify.com/v1/batch/geocode/search"
     ROUTE_VIEW_URL = "https://www.openstreetmap.org/directions"
+    _ENGINE_BY_MODE = {
+        "drive": "fossgis_osrm_car",
+        "walk": "fossgis_osrm_foot",
+        "foot": "fossgis_osrm_foot",
+        "bike": "fossgis_osrm_bike",
+        "bicycle": "fossgis_osrm_bike",
+    }
+    # Batch jobs are asynchronous (submit + poll); only worth it for larger routes.
+    BATCH_MIN_ADDRESSES = 10
+    BATCH_POLL_SECONDS = 1.0
+    BATCH_MAX_POLLS = 30
+    # Windows this small are ordered locally by straight-line distance.
+    LOCAL_ORDER_MAX_STOPS = 6
 
     def __init__(
         self,
@@ -46,171 +111,325 @@ class GeoapifyRoutingManager(BaseRoutingManager):
 
         self.mode = "drive"  # Geoapify routing mode; we translate to OSRM viewer
         self.avoid: Optional[str] = None
+        self._http = _SESSION
+        # Per-route memo in front of geocode_cache; repeat addresses (origin as
+        # destination, shared sites) skip the TTL-checked cache lookup entirely.
+        self._geocode_cached = lru_cache(maxsize=1024)(self._geocode_impl)
+        # Open the TLS connection while the caller is still adding stops.
+        self._warm_thread: Optional[threading.Thread] = None
+        if settings.geoapify_warmup and _claim_warmup():
+            self._warm_thread = threading.Thread(target=self._warm_connection, name="geoapify-warm", daemon=True)
+            self._warm_thread.start()
+
+    def __enter__(self) -> "GeoapifyRoutingManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Wait for any warm-up request; the pooled session is shared and stays open."""
+        if self._warm_thread is not None:
+            self._warm_thread.join(timeout=5)
+
+    def _warm_connection(self) -> None:
+        """Best-effort keyless HEAD so the pool holds an established socket."""
+        try:
+            self._http.head(self.API_ROOT, timeout=3)
+        except Exception as exc:
+            logger.debug("[GEOAPIFY] Connection warm-up skipped: %s", exc)
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
+    def _geoapify_call(self, method: str, url: str, **kwargs):
+        """Issue a Geoapify request under the process-wide rate limit."""
+        GEOAPIFY_LIMITER.acquire()
+        resp = getattr(self._http, method)(url, **kwargs)
+        if resp.status_code == 429:
+            GEOAPIFY_LIMITER.penalize()
+        return resp
+
     def _geocode(self, address: str) -> Optional[tuple[float, float]]:
         """Return (lon, lat) for an address or None on failure."""
-        cache_key = address.strip().lower()
+        return self._geocode_cached(address)
+
+    def _geocode_impl(self, address: str) -> Optional[tuple[float, float]]:
+        """Uncached-in-process lookup: geocode_cache, then the Geoapify API."""
+        cache_key = normalize_address(address)
         cached = geocode_cache.get(cache_key)
         if cached:
             return tuple(cached)
+        if geocode_miss_cache.get(cache_key):
+            return None
 
-        attempts = 3
+        params = {
+            "text": address,
+            "limit": 1,
+            "format": "json",
+            "apiKey": self.api_key,
+        }
         try:
-            for attempt in range(1, attempts + 1):
-                params = {
-                    "text": address,
-                    "limit": 1,
-                    "format": "json",
-                    "apiKey": self.api_key,
-                }
-                resp = requests.get(self.GEOCODE_URL, params=params, timeout=6)
-                if resp.status_code == 429:
-                    logger.warning("[GEOAPIFY] Rate limited on geocode '%s' (attempt %d/%d)", address, attempt, attempts)
-                    time.sleep(1.5 * attempt)
-                    continue
+            resp = self._geoapify_call("get", self.GEOCODE_URL, params=params, timeout=6)
+            resp.raise_for_status()
+            result = self._coord_from_result(_decode_json(resp))
+        except Exception as exc:  # pragma: no cover - defensive network guard
+            logger.error("[GEOAPIFY] Geocode failed for '%s': %s", address, exc)
+            return None
 
-                resp.raise_for_status()
+        if not result:
+            logger.warning("[GEOAPIFY] No geocode result for '%s'", address)
+            geocode_miss_cache.set(cache_key, True)
+            return None
 
-                data = resp.json()
-                result = None
-                if isinstance(data, dict):
-                    results = data.get("results") or data.get("features")
-                    if results:
-                        first = results[0]
-                        # handle both results list shape and GeoJSON features
-                        if "lon" in first and "lat" in first:
-                            result = (first["lon"], first["lat"])
-                        elif "geometry" in first and first["geometry"].get("coordinates"):
-                            lon, lat = first["geometry"]["coordinates"][:2]
-                            result = (lon, lat)
+        geocode_cache.set(cache_key, list(result))
+        return result
 
-                if result:
-                    geocode_cache.set(cache_key, list(result))
-                    return result
+    @staticmethod
+    def _coord_from_result(data) -> Optional[tuple[float, float]]:
+        """Extract (lon, lat) from a search response, batch row or GeoJSON feature."""
+        if not isinstance(data, dict):
+            return None
+        results = data.get("results") or data.get("features")
+        first = results[0] if results else data
+        # handle both results list shape and GeoJSON features
+        if "lon" in first and "lat" in first:
+            return (first["lon"], first["lat"])
+        if "geometry" in first and first["geometry"].get("coordinates"):
+            lon, lat = first["geometry"]["coordinates"][:2]
+            return (lon, lat)
+        return None
 
-                logger.warning("[GEOAPIFY] No geocode result for '%s' (attempt %d/%d)", address, attempt, attempts)
-                time.sleep(0.5 * attempt)
+    def _geocode_batch(self, addresses: List[str]) -> List[Optional[tuple[float, float]]]:
+        """
+        Resolve addresses with one Geoapify batch job (submit + poll) instead of
+        one request each. Cache hits are served locally and results keep the
+        input order. Raises when the job cannot be submitted or completed so the
+        caller can fall back to per-address lookups.
+        """
+        results: List[Optional[tuple[float, float]]] = [None] * len(addresses)
+        misses: Dict[str, List[int]] = {}
+        for idx, addr in enumerate(addresses):
+            key = normalize_address(addr)
+            cached = geocode_cache.get(key)
+            if cached:
+                results[idx] = tuple(cached)
+            elif not geocode_miss_cache.get(key):
+                misses.setdefault(addr, []).append(idx)
+        if not misses:
+            return results
+
+        pending = list(misses)
+        params = {"apiKey": self.api_key, "format": "json"}
+        resp = self._geoapify_call("post", self.BATCH_GEOCODE_URL, params=params, json=pending, timeout=10)
+        resp.raise_for_status()
+        job = _decode_json(resp)
+
+        # A 200 carries results directly; a 202 hands back a job id to poll.
+        rows = job if isinstance(job, list) else None
+        polls = 0
+        while rows is None:
+            if polls >= self.BATCH_MAX_POLLS:
+                raise TimeoutError(f"Geoapify batch job {job.get('id')} did not complete")
+            polls += 1
+            time.sleep(self.BATCH_POLL_SECONDS)
+            poll = self._geoapify_call(
+                "get",
+                self.BATCH_GEOCODE_URL,
+                params={**params, "id": job.get("id")},
+                timeout=10,
+            )
+            if poll.status_code == 202:
+                continue
+            poll.raise_for_status()
+            data = _decode_json(poll)
+            rows = data if isinstance(data, list) else None
+
+        fresh = {}
+        unresolved = {}
+        for addr, row in zip(pending, rows):
+            coord = self._coord_from_result(row)
+            if not coord:
+                unresolved[normalize_address(addr)] = True
+                continue
+            fresh[normalize_address(addr)] = list(coord)
+            for idx in misses[addr]:
+                results[idx] = coord
+        geocode_cache.set_many(fresh)
+        geocode_miss_cache.set_many(unresolved)
+        logger.info("[GEOAPIFY] Batch geocoded %d/%d address(es)", len(fresh), len(pending))
+        return results
+
+    def _geocode_many(self, addresses: Iterable[str]) -> Dict[str, Optional[tuple[float, float]]]:
+        """
+        Geocode addresses and return {address: (lon, lat) | None}. Large routes
+        go through one batch job; otherwise (or if the batch fails) lookups run
+        concurrently. Duplicate addresses are looked up once.
+        """
+        unique = list(dict.fromkeys(a for a in addresses if a))
+        if len(unique) >= self.BATCH_MIN_ADDRESSES:
+            try:
+                return dict(zip(unique, self._geocode_batch(unique)))
+            except Exception as exc:
+                logger.warning("[GEOAPIFY] Batch geocode failed (%s); using per-address lookups", exc)
 
-        except Exception as exc:  # pragma: no cover - defensive network guard
-            logger.error("[GEOAPIFY] Geocode failed for '%s': %s", address, exc)
+        if len(unique) < 2:
+            return {addr: self._geocode(addr) for addr in unique}
 
-        return None
+        # The shared pool's 8 workers bound concurrency across every route build.
+        return dict(zip(unique, _GEOCODE_POOL.map(self._geocode, unique)))
+
+    @staticmethod
+    def _nearest_neighbor_order(matrix: List[List[Optional[float]]], n: int) -> List[int]:
+        """
+        Greedy nearest-neighbor order starting at index 0. Missing (None) costs
+        are unreachable; the order stops short if nothing reachable remains.
+        """
+        inf = float("inf")
+        remaining = list(range(1, n))
+        order = [0]
+        while remaining:
+            row = matrix[order[-1]]
+            # min() runs the scan in C and keeps the lowest index on ties.
+            best = min(remaining, key=lambda idx: inf if row[idx] is None else row[idx])
+            if row[best] is None or row[best] == inf:
+                break
+            remaining.remove(best)
+            order.append(best)
+        return order
+
+    @staticmethod
+    def _two_opt(order: List[int], matrix: List[List[Optional[float]]], max_passes: int = 5) -> List[int]:
+        """
+        Refine an open path (first stop pinned) with 2-opt segment reversals
+        over the matrix already in memory. Segment costs are summed in both
+        directions so asymmetric drive-time matrices are compared correctly.
+        """
+        inf = float("inf")
+
+        def cost(a: int, b: int) -> float:
+            value = matrix[a][b]
+            return inf if value is None else value
+
+        path = list(order)
+        n = len(path)
+        for _ in range(max_passes):
+            improved = False
+            for i in range(1, n - 1):
+                prev = path[i - 1]
+                forward = backward = 0.0
+                for j in range(i + 1, n):
+                    forward += cost(path[j - 1], path[j])
+                    backward += cost(path[j], path[j - 1])
+                    before = cost(prev, path[i]) + forward
+                    after = cost(prev, path[j]) + backward
+                    if j + 1 < n:
+                        before += cost(path[j], path[j + 1])
+                        after += cost(path[i], path[j + 1])
+                    if after < before:
+                        path[i : j + 1] = path[i : j + 1][::-1]
+                        improved = True
+                        break
+            if not improved:
+                break
+        return path
+
+    @classmethod
+    def _haversine_order(cls, coords: List[tuple[float, float]]) -> List[int]:
+        """Order (lon, lat) points by great-circle distance without a network call."""
+        n = len(coords)
+        lons = [math.radians(lon) for lon, _ in coords]
+        lats = [math.radians(lat) for _, lat in coords]
+        cos_lats = [math.cos(lat) for lat in lats]
+
+        # Symmetric with a zero diagonal: evaluate each pair once, with cos(lat)
+        # hoisted per point instead of recomputed per pair.
+        matrix = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                h = (
+                    math.sin((lats[j] - lats[i]) / 2) ** 2
+                    + cos_lats[i] * cos_lats[j] * math.sin((lons[j] - lons[i]) / 2) ** 2
+                )
+                matrix[i][j] = matrix[j][i] = 2 * math.asin(math.sqrt(h))
+        return cls._two_opt(cls._nearest_neighbor_order(matrix, len(coords)), matrix)
 
     def _optimize_order_geoapify(self, coords: List[tuple[float, float]]) -> Optional[List[int]]:
         """
         Try to optimize waypoint order using Geoapify's route matrix (simple heuristic).
         Returns an index list or None on failure. This keeps us on Geoapify and avoids
-        public OSRM dependencies.
+        public OSRM dependencies. Windows of LOCAL_ORDER_MAX_STOPS or fewer are
+        ordered locally by great-circle distance instead.
         """
         if len(coords) < 3 or not self.api_key:
             return None
+        if len(coords) <= self.LOCAL_ORDER_MAX_STOPS:
+            return self._haversine_order(coords)
+        return self._cached_optimization(
+            f"geoapify_{self.mode or 'drive'}", coords, lambda: self._fetch_matrix_order(coords)
+        )
 
-        attempts = 2
+    def _fetch_matrix_order(self, coords: List[tuple[float, float]]) -> Optional[List[int]]:
+        """Order `coords` from a Geoapify route matrix (uncached)."""
         url = "https://api.geoapify.com/v1/routematrix"
-        for attempt in range(1, attempts + 1):
-            try:
-                payload = {
-                    "mode": self.mode or "drive",
-                    "sources": coords,
-                    "targets": coords,
-                }
-                resp = requests.post(
-                    url,
-                    params={"apiKey": self.api_key},
-                    json=payload,
-                    timeout=8 * attempt,
-                )
-                if not resp.ok:
-                    logger.warning(
-                        "[GEOAPIFY] Matrix failed (%d/%d): %s %s",
-                        attempt,
-                        attempts,
-                        resp.status_code,
-                        resp.text[:120],
-                    )
-                    time.sleep(1.0 * attempt)
-                    continue
-
-                data = resp.json()
-                matrix = data.get("times") or data.get("distances")
-                if not matrix:
-                    return None
-
-                n = len(coords)
-                visited = {0}
-                order = [0]
-                current = 0
-                # simple nearest-neighbor heuristic
-                while len(order) < n:
-                    best = None
-                    best_cost = float("inf")
-                    for idx in range(n):
-                        if idx in visited:
-                            continue
-                        cost = matrix[current][idx]
-                        if cost is None:
-                            continue
-                        if cost < best_cost:
-                            best_cost = cost
-                            best = idx
-                    if best is None:
-                        break
-                    visited.add(best)
-                    order.append(best)
-                    current = best
-
-                if len(order) == n:
-                    logger.info("[GEOAPIFY] Optimized %d stops via routematrix", n)
-                    return order
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("[GEOAPIFY] Matrix optimization exception (%d/%d): %s", attempt, attempts, exc)
-                time.sleep(1.0 * attempt)
+        payload = {
+            "mode": self.mode or "drive",
+            "sources": coords,
+            "targets": coords,
+        }
+        try:
+            resp = self._geoapify_call("post", url, params={"apiKey": self.api_key}, json=payload, timeout=10)
+            if not resp.ok:
+                logger.warning("[GEOAPIFY] Matrix failed: %s %s", resp.status_code, resp.text[:120])
+                return None
+
+            data = _decode_json(resp)
+            matrix = data.get("times") or data.get("distances")
+            if not matrix:
+                return None
+
+            n = len(coords)
+            order = self._two_opt(self._nearest_neighbor_order(matrix, n), matrix)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("[GEOAPIFY] Matrix optimization exception: %s", exc)
+            return None
 
+        if len(order) == n:
+            logger.info("[GEOAPIFY] Optimized %d stops via routematrix", n)
+            return order
         return None
 
     def _optimize_order_osrm(self, coords: List[tuple[float, float]]) -> Optional[List[int]]:
         """
-        Try to optimize waypoint order using OSRM's trip service with retries.
+        Try to optimize waypoint order using OSRM's trip service.
         Returns an index order list or None on failure.
         """
         if len(coords) < 3:
             return None
+        return self._cached_optimization("osrm_trip", coords, lambda: self._fetch_osrm_trip_order(coords))
 
+    def _fetch_osrm_trip_order(self, coords: List[tuple[float, float]]) -> Optional[List[int]]:
+        """Order `coords` with the OSRM trip service (uncached)."""
         base = (settings.osm_base_url or "https://router.project-osrm.org").rstrip("/")
         coord_str = ";".join([f"{lon},{lat}" for lon, lat in coords])
         url = f"{base}/trip/v1/driving/{coord_str}"
         params = {"source": "first", "destination": "last", "roundtrip": "false"}
 
-        attempts = 3
-        for attempt in range(1, attempts + 1):
-            try:
-                resp = requests.get(url, params=params, timeout=8 * attempt)
-                if not resp.ok:
-                    logger.warning(
-                        "[OSRM] Trip optimization failed (%d/%d): %s %s",
-                        attempt,
-                        attempts,
-                        resp.status_code,
-                        resp.text[:120],
-                    )
-                    time.sleep(1.0 * attempt)
-                    continue
-
-                data = resp.json()
-                waypoints = data.get("waypoints", [])
-                if not waypoints:
-                    return None
-
-                order = sorted(range(len(waypoints)), key=lambda i: waypoints[i].get("waypoint_index", i))
-                return order
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("[OSRM] Trip optimization exception (%d/%d): %s", attempt, attempts, exc)
-                time.sleep(1.0 * attempt)
+        try:
+            resp = self._http.get(url, params=params, timeout=10)
+            if not resp.ok:
+                logger.warning("[OSRM] Trip optimization failed: %s %s", resp.status_code, resp.text[:120])
+                return None
+
+            data = _decode_json(resp)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("[OSRM] Trip optimization exception: %s", exc)
+            return None
 
-        return None
+        waypoints = data.get("waypoints", [])
+        if not waypoints:
+            return None
+        return sorted(range(len(waypoints)), key=lambda i: waypoints[i].get("waypoint_index", i))
 
     # ------------------------------------------------------------------
     # Main URL builder
@@ -233,43 +452,59 @@ class GeoapifyRoutingManager(BaseRoutingManager):
         windowed_coords: List[tuple[str, tuple[float, float]]] = []
         failed: List[str] = []
 
-        # Geocode origin up front
+        # Geocode every address (origin, stops, override destination) in one batch
         origin = self.origin or (self.stops[0].address if self.stops else "")
-        origin_coord = self._geocode(origin)
+        coords = self._geocode_many(
+            [origin, *(s.address for group in grouped for s in group), self.destination_override or ""]
+        )
+        origin_coord = coords.get(origin)
         if not origin_coord:
             raise ValueError(f"Could not geocode origin '{origin}' via Geoapify.")
         windowed_coords.append((origin, origin_coord))
 
         # Process windows independently; optimize within each window if possible.
+        windows: List[List[tuple[str, tuple[float, float]]]] = []
         for group in grouped:
-            addrs = [s.address for s in group]
             addr_coords: List[tuple[str, tuple[float, float]]] = []
-            for addr in addrs:
-                coord = self._geocode(addr)
+            for addr in (s.address for s in group):
+                coord = coords.get(addr)
                 if not coord:
                     logger.warning("[GEOAPIFY] Skipping address (no geocode): %s", addr)
                     failed.append(addr)
                     continue
                 addr_coords.append((addr, coord))
-
-            if len(addr_coords) > 2:
-                coord_list = [c for _, c in addr_coords]
-                order = self._optimize_order_geoapify(coord_list)
+            windows.append(addr_coords)
+
+        # Windows are independent, so their matrix requests run concurrently.
+        optimizable = [idx for idx, w in enumerate(windows) if len(w) > 2]
+        orders: Dict[int, Optional[List[int]]] = {}
+        if optimizable:
+            futures = {
+                idx: _OPTIMIZE_POOL.submit(self._optimize_order_geoapify, [c for _, c in windows[idx]])
+                for idx in optimizable
+            }
+            orders = {idx: fut.result() for idx, fut in futures.items()}
+
+        for idx, addr_coords in enumerate(windows):
+            if idx in orders:
+                order = orders[idx]
                 if order:
-                    addr_coords = [addr_coords[i] for i in order]
+                    addr_coords = reorder(addr_coords, order)
                     logger.info("[GEOAPIFY] Optimized %d stops within window", len(addr_coords))
                 else:
                     logger.info("[GEOAPIFY] Using window order (no optimization) for %d stops", len(addr_coords))
 
             windowed_coords.extend(addr_coords)
 
-        # Destination override / return to origin
-        destination = (
-            self.destination_override
-            if self.destination_override
-            else (self.origin if self.end_at_origin else (windowed_coords[-1][0] if windowed_coords else origin))
-        )
-        dest_coord = self._geocode(destination)
+        # Destination override / return to origin. Every candidate was resolved in
+        # the batch above, and returning to origin reuses origin_coord directly.
+        if self.destination_override:
+            destination = self.destination_override
+        elif self.end_at_origin:
+            destination = origin
+        else:
+            destination = windowed_coords[-1][0]
+        dest_coord = origin_coord if destination == origin else coords.get(destination)
         if dest_coord:
             windowed_coords.append((destination, dest_coord))
         else:
@@ -289,20 +524,20 @@ class GeoapifyRoutingManager(BaseRoutingManager):
         ordered_addresses = [addr for addr, _ in windowed_coords]
         logger.info("[GEOAPIFY] Final waypoint order: %s", " -> ".join(ordered_addresses))
 
+        # Format each waypoint once; both links below reuse the "lat,lon" strings.
+        latlons = [f"{lat},{lon}" for _, (lon, lat) in windowed_coords]
+
         # Build an OSRM map link (shows all waypoints reliably).
-        loc_params = "&".join([f"loc={lat},{lon}" for _, (lon, lat) in windowed_coords])
+        loc_params = "&".join(f"loc={latlon}" for latlon in latlons)
         osrm_url = f"https://map.project-osrm.org/?{loc_params}"
 
         # Keep the OSM directions-style URL as a secondary reference
-        route_param = ";".join([f"{lat},{lon}" for _, (lon, lat) in windowed_coords])
-        engine = "fossgis_osrm_car"
-        if self.mode in ("walk", "foot"):
-            engine = "fossgis_osrm_foot"
-        elif self.mode in ("bike", "bicycle"):
-            engine = "fossgis_osrm_bike"
+        route_param = ";".join(latlons)
+        engine = self._ENGINE_BY_MODE.get(self.mode, "fossgis_osrm_car")
         osm_url = f"{self.ROUTE_VIEW_URL}?engine={engine}&route={route_param}"
 
         logger.info("[GEOAPIFY] Generated OSRM map link with Geoapify geocoding.")
+        logger.debug("[GEOAPIFY] OSM directions fallback: %s", osm_url)
         # Prefer OSRM map link to ensure via points render; fallback remains in logs.
         return osrm_url
 
@@ -4,15 +4,22 @@ from __future__ import annotations
 
 import logging
 from typing import List
-import requests
-from .base import BaseRoutingManager, RouteStop
+from urllib.parse import quote
+from .base import _OPTIMIZE_POOL, BaseRoutingManager, RouteStop, reorder
+from optimized_routing.utils.http import build_session
 
 logger = logging.getLogger(__name__)
 
+_SESSION = build_session(pool_connections=4, pool_maxsize=32)
+
 
 class MapboxRoutingManager(BaseRoutingManager):
     BASE_URL = "https://api.mapbox.com/optimized-trips/v1/mapbox/driving"
     CLICK_URL = "https://www.mapbox.com/directions"
+    # Constant optimized-trips query; only the access token varies per manager.
+    OPTIMIZE_QUERY = "roundtrip=true&source=first&destination=last&overview=full&annotations=distance,duration"
+    # Mapbox rejects optimized-trips requests with more than 12 coordinates.
+    MAX_OPTIMIZE_WAYPOINTS = 12
 
     def __init__(self, origin: str = None, destination_override: str = None):
         super().__init__(origin or "", destination_override=destination_override)
@@ -21,12 +28,18 @@ class MapboxRoutingManager(BaseRoutingManager):
         self.api_token = settings.mapbox_api_key
         if not self.api_token:
             raise ValueError("MAPBOX_API_KEY not set in environment")
+        self._optimize_suffix = f"?access_token={quote(self.api_token, safe='')}&{self.OPTIMIZE_QUERY}"
 
     # ----------------------------------------------------------------------
     def _geocode(self, address: str) -> tuple[float | None, float | None]:
-        """Convert human-readable address to `(lon, lat)`."""
+        """Convert human-readable address to `(lon, lat)`, via the shared geocode cache."""
+        coords = self._cached_geocode("mapbox", address, self._fetch_geocode)
+        return tuple(coords) if coords else (None, None)
+
+    def _fetch_geocode(self, address: str) -> list[float] | None:
+        """Forward-geocode with Mapbox; returns `[lon, lat]` or None."""
         try:
-            r = requests.get(
+            r = _SESSION.get(
                 "https://api.mapbox.com/search/geocode/v6/forward",
                 params={"q": address, "access_token": self.api_token},
                 timeout=6,
@@ -37,10 +50,10 @@ class MapboxRoutingManager(BaseRoutingManager):
                 raise ValueError(f"No geocode result for '{address}'")
 
             coords = features[0]["geometry"]["coordinates"]
-            return coords[0], coords[1]  # lon, lat
+            return [coords[0], coords[1]]  # lon, lat
         except Exception as e:
-            logger.error(f"[MAPBOX] Geocode failed for '{address}': {e}")
-            return None, None
+            logger.error("[MAPBOX] Geocode failed for '%s': %s", address, e)
+            return None
 
     # ----------------------------------------------------------------------
     def build_route_url(self) -> str:
@@ -57,67 +70,108 @@ class MapboxRoutingManager(BaseRoutingManager):
             origin = route_stops[0].address
             route_stops = route_stops[1:]
 
-        waypoints: list[str] = []
-        lon, lat = self._geocode(origin)
+        geocoded = self._geocode_concurrently(
+            self._geocode,
+            [origin, *(stop.address for stop in route_stops), self.destination_override],
+        )
+
+        lon, lat = geocoded[origin]
         if lon is None:
             raise ValueError(f"Could not geocode origin '{origin}' via Mapbox.")
-        waypoints.append(f"{lon},{lat}")
+        origin_coord = f"{lon},{lat}"
+        waypoints: list[str] = [origin_coord]
 
         for stop in route_stops:
-            lon, lat = self._geocode(stop.address)
+            lon, lat = geocoded[stop.address]
             if lon is not None:
                 waypoints.append(f"{lon},{lat}")
             else:
                 logger.warning("[MAPBOX] Skipping address with no geocode: %s", stop.address)
 
         if self.destination_override:
-            lon, lat = self._geocode(self.destination_override)
+            lon, lat = geocoded[self.destination_override]
             if lon is not None:
                 waypoints.append(f"{lon},{lat}")
             else:
                 logger.warning("[MAPBOX] Destination geocode failed: %s", self.destination_override)
         else:
-            waypoints.append(waypoints[0])
+            # Round trip: close the loop on the origin coordinates already resolved above.
+            waypoints.append(origin_coord)
 
         if len(waypoints) < 2:
             raise ValueError("Could not geocode enough locations to build a Mapbox route.")
 
         coord_string = ";".join(waypoints)
+        fallback_url = f"{self.CLICK_URL}?coordinates={coord_string}"
+        if len(waypoints) <= 3:
+            # First and last are pinned, so at most one stop can move: nothing to optimize.
+            return fallback_url
 
-        try:
-            r = requests.get(
-                f"{self.BASE_URL}/{coord_string}",
-                params={
-                    "access_token": self.api_token,
-                    "roundtrip": "true",
-                    "source": "first",
-                    "destination": "last",
-                    "overview": "full",
-                    "annotations": "distance,duration",
-                },
-                timeout=8,
-            )
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            logger.error(f"[MAPBOX] Optimization failure: {e}")
+        coords_for_url = self._optimize_waypoints(waypoints)
+        if not coords_for_url:
             # return a static but still valid viewer link
-            return f"{self.CLICK_URL}?coordinates={coord_string}"
+            return fallback_url
 
-        waypoints_order = data.get("waypoints", [])
-        coords_for_url = []
-
-        if not waypoints_order:
-            return f"{self.CLICK_URL}?coordinates={coord_string}"
+        viewer_url = f"{self.CLICK_URL}?coordinates=" + ";".join(coords_for_url)
+        return viewer_url
 
-        for wp in waypoints_order:
-            lon, lat = wp.get("location", [None, None])
-            if lon is None:
-                continue
-            coords_for_url.append(f"{lon},{lat}")
+    # ----------------------------------------------------------------------
+    def _optimize_waypoints(self, waypoints: list[str]) -> list[str] | None:
+        """
+        Optimize `waypoints` (first and last pinned). Routes over the Mapbox
+        coordinate limit are split at fixed boundary points into overlapping
+        segments that are optimized concurrently and stitched back together.
+        """
+        limit = self.MAX_OPTIMIZE_WAYPOINTS
+        if len(waypoints) <= limit:
+            return self._optimized(waypoints)
+
+        # Segments share their boundary point: [0..11], [11..22], ... in window order.
+        step = limit - 1
+        segments = [waypoints[i : i + limit] for i in range(0, len(waypoints) - 1, step)]
+        optimized = list(_OPTIMIZE_POOL.map(self._optimize_segment, segments))
+
+        stitched = list(optimized[0])
+        for segment in optimized[1:]:
+            stitched.extend(segment[1:])
+        logger.info("[MAPBOX] Optimized %d waypoints in %d segments", len(waypoints), len(segments))
+        return stitched
+
+    def _optimize_segment(self, segment: list[str]) -> list[str]:
+        if len(segment) <= 3:
+            return segment
+        return self._optimized(segment) or segment
+
+    def _optimized(self, points: list[str]) -> list[str] | None:
+        """
+        `points` (our geocoded "lon,lat" strings) in Mapbox's optimized order,
+        or None unless the returned order is a permutation of every point that
+        keeps both endpoints pinned.
+        """
+        order = self._cached_optimization(
+            "mapbox_order", points, lambda: self._fetch_optimized_order(";".join(points))
+        )
+        last = len(points) - 1
+        if order and sorted(order) == list(range(len(points))) and order[0] == 0 and order[-1] == last:
+            return reorder(points, order)
+        return None
 
-        if not coords_for_url:
-            return f"{self.CLICK_URL}?coordinates={coord_string}"
+    # ----------------------------------------------------------------------
+    def _fetch_optimized_order(self, coord_string: str) -> list[int] | None:
+        """
+        Run the Mapbox optimized-trips request; returns input indices in visit
+        order or None. Mapbox lists waypoints in input order (with road-snapped
+        locations) and gives each one's position in the trip as `waypoint_index`.
+        """
+        try:
+            r = _SESSION.get(f"{self.BASE_URL}/{coord_string}{self._optimize_suffix}", timeout=8)
+            r.raise_for_status()
+            data = r.json()
+        except Exception as e:
+            logger.error("[MAPBOX] Optimization failure: %s", e)
+            return None
 
-        viewer_url = f"{self.CLICK_URL}?coordinates=" + ";".join(coords_for_url)
-        return viewer_url
+        waypoints = data.get("waypoints", [])
+        if not waypoints:
+            return None
+        return sorted(range(len(waypoints)), key=lambda i: waypoints[i].get("waypoint_index", i))
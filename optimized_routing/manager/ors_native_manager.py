@@ -11,14 +11,15 @@ Flow:
 
 import os
 import logging
-from urllib.parse import quote_plus
 from typing import List, Optional
-import requests
 
-from .base import BaseRoutingManager, RouteStop
+from .base import BaseRoutingManager, RouteStop, reorder
+from optimized_routing.utils.http import build_session
 
 logger = logging.getLogger(__name__)
 
+_SESSION = build_session(pool_connections=4, pool_maxsize=32)
+
 
 class ORSNativeRoutingManager(BaseRoutingManager):
     def __init__(
@@ -41,12 +42,15 @@ class ORSNativeRoutingManager(BaseRoutingManager):
     # Helper: geocode
     # ----------------------------------------------------------------------
     def _geocode(self, addr: str) -> Optional[List[float]]:
+        return self._cached_geocode("ors", addr, self._fetch_geocode)
+
+    def _fetch_geocode(self, addr: str) -> Optional[List[float]]:
         if not self.ORS_KEY:
             logger.warning("[ORS] No API key set — cannot geocode.")
             return None
 
         try:
-            r = requests.get(
+            r = _SESSION.get(
                 "https://api.openrouteservice.org/geocode/search",
                 params={"api_key": self.ORS_KEY, "text": addr},
                 timeout=6,
@@ -68,9 +72,12 @@ class ORSNativeRoutingManager(BaseRoutingManager):
     def _optimize(self, coords: List[List[float]]) -> Optional[List[int]]:
         if not self.ORS_KEY:
             return None
+        return self._cached_optimization("ors", coords, lambda: self._fetch_optimized_order(coords))
+
+    def _fetch_optimized_order(self, coords: List[List[float]]) -> Optional[List[int]]:
 
         try:
-            r = requests.post(
+            r = _SESSION.post(
                 "https://api.openrouteservice.org/v2/directions/driving-car/optimized",
                 json={"coordinates": coords},
                 headers={"Authorization": self.ORS_KEY},
@@ -100,19 +107,21 @@ class ORSNativeRoutingManager(BaseRoutingManager):
             addresses.append(self.destination_override)
 
         # 2️⃣ Geocode all addresses
+        geocoded = self._geocode_concurrently(self._geocode, addresses)
         coords: List[List[float]] = []
         for addr in addresses:
-            c = self._geocode(addr)
+            c = geocoded.get(addr)
             if not c:
                 raise ValueError(f"Could not geocode: {addr}")
             coords.append(c)
 
-        # 3️⃣ Try optimization
-        order = self._optimize(coords)
-        if order:
-            coords = [coords[i] for i in order]
-        else:
-            logger.warning("[ORS] Optimization failed, using original order.")
+        # 3️⃣ Try optimization (two points have only one order; skip the API call)
+        if len(coords) > 2:
+            order = self._optimize(coords)
+            if order:
+                coords = reorder(coords, order)
+            else:
+                logger.warning("[ORS] Optimization failed, using original order.")
 
         # 4️⃣ Construct ORS shareable URL
         coord_str = "/".join([f"{c[0]},{c[1]}" for c in coords])
@@ -4,12 +4,20 @@ from __future__ import annotations
 
 import logging
 from typing import List, Optional
-import requests
 
-from .base import RouteStop, BaseRoutingManager
+from .base import RouteStop, BaseRoutingManager, reorder
+from optimized_routing.utils.http import build_session
+from optimized_routing.utils.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Module-wide keep-alive pool: Nominatim/ORS sockets survive across geocodes and routes.
+_SESSION = build_session(pool_connections=4, pool_maxsize=32)
+
+# Public Nominatim allows one request per second; parallel geocodes queue here.
+PUBLIC_NOMINATIM_HOST = "nominatim.openstreetmap.org"
+NOMINATIM_LIMITER = TokenBucket(rate=1, capacity=1)
+
 
 class OSMRoutingManager(BaseRoutingManager):
     """
@@ -33,11 +41,17 @@ class OSMRoutingManager(BaseRoutingManager):
     # --------------------------------------------------------------------
 
     def _geocode_address(self, address: str) -> Optional[List[float]]:
+        """Geocode address to `[lon, lat]` through the shared on-disk geocode cache."""
+        return self._cached_geocode("osm", address, self._fetch_geocode)
+
+    def _fetch_geocode(self, address: str) -> Optional[List[float]]:
         """
         Geocode address to `[lon, lat]`, preferring Nominatim and falling back to ORS.
         """
         try:
-            r = requests.get(
+            if PUBLIC_NOMINATIM_HOST in self.nominatim_url:
+                NOMINATIM_LIMITER.acquire()
+            r = _SESSION.get(
                 self.nominatim_url,
                 params={"q": address, "format": "jsonv2", "limit": 1},
                 headers={"User-Agent": "optimized-routing-extension/1.1"},
@@ -55,7 +69,7 @@ class OSMRoutingManager(BaseRoutingManager):
             return None
 
         try:
-            r = requests.get(
+            r = _SESSION.get(
                 "https://api.openrouteservice.org/geocode/search",
                 params={"api_key": self.ors_key, "text": address},
                 timeout=6,
@@ -79,12 +93,16 @@ class OSMRoutingManager(BaseRoutingManager):
         """
         if not self.ors_key:
             return None
+        return self._cached_optimization("ors", coords, lambda: self._fetch_optimized_order(coords))
+
+    def _fetch_optimized_order(self, coords: List[List[float]]) -> Optional[List[int]]:
+        """POST coords to the ORS optimization endpoint (uncached)."""
 
         try:
             url = "https://api.openrouteservice.org/v2/directions/driving-car/optimized"
             payload = {"coordinates": coords}
 
-            r = requests.post(
+            r = _SESSION.post(
                 url,
                 json=payload,
                 headers={"Authorization": self.ors_key},
@@ -107,7 +125,8 @@ class OSMRoutingManager(BaseRoutingManager):
     # Main route builder
     # --------------------------------------------------------------------
 
-    def build_route_url(self) -> str:
+    def _routed_points(self) -> list[tuple[str, list[float]]]:
+        """Deduplicate, window-order and geocode stops into `(address, [lon, lat])` points."""
         if not self.stops:
             raise ValueError("No stops available to generate a route.")
 
@@ -119,21 +138,26 @@ class OSMRoutingManager(BaseRoutingManager):
             origin = route_stops[0].address
             route_stops = route_stops[1:]
 
+        geocoded = self._geocode_concurrently(
+            self._geocode_address,
+            [origin, *(stop.address for stop in route_stops), self.destination_override],
+        )
+
         routed_points: list[tuple[str, list[float]]] = []
-        origin_coords = self._geocode_address(origin)
+        origin_coords = geocoded.get(origin)
         if not origin_coords:
             raise ValueError(f"Could not geocode origin '{origin}' for OSM routing.")
         routed_points.append((origin, origin_coords))
 
         for stop in route_stops:
-            coords = self._geocode_address(stop.address)
+            coords = geocoded.get(stop.address)
             if coords:
                 routed_points.append((stop.address, coords))
             else:
                 logger.warning("[OSM] Skipping address with no geocode: %s", stop.address)
 
         if self.destination_override:
-            destination_coords = self._geocode_address(self.destination_override)
+            destination_coords = geocoded.get(self.destination_override)
             if destination_coords:
                 routed_points.append((self.destination_override, destination_coords))
             else:
@@ -143,21 +167,138 @@ class OSMRoutingManager(BaseRoutingManager):
 
         if len(routed_points) < 2:
             raise ValueError("Could not geocode enough locations to build an OSM route.")
+        return routed_points
 
+    def _apply_order(self, routed_points: list[tuple[str, list[float]]]) -> list[tuple[str, list[float]]]:
+        """Reorder points with this manager's own ORS optimization, if it succeeds."""
         coords = [point for _, point in routed_points]
-        if len(coords) > 2:
+        # Endpoints are fixed, so a single intermediate stop has only one possible order.
+        if len(coords) > 3:
             order = self._optimize_order(coords)
             if order:
                 logger.info("[ORS] Using optimized waypoint order")
-                routed_points = [routed_points[i] for i in order]
-            else:
-                logger.warning("[ORS] Optimization failed — using original order")
+                return reorder(routed_points, order)
+            logger.warning("[ORS] Optimization failed — using original order")
         else:
             logger.info("[ORS] Optimization skipped")
+        return routed_points
 
+    def _viewer_url(self, routed_points: list[tuple[str, list[float]]]) -> str:
         loc_params = "&".join(
             f"loc={lat},{lon}"
             for _, (lon, lat) in routed_points
         )
         logger.info("[OSM] Built OSRM map URL with %d routed points", len(routed_points))
         return f"{self.osrm_view_url}?{loc_params}"
+
+    def build_route_url(self) -> str:
+        return self._viewer_url(self._apply_order(self._routed_points()))
+
+
+# ------------------------------------------------------------------------
+# Multi-technician batching
+# ------------------------------------------------------------------------
+
+ORS_OPTIMIZATION_URL = "https://api.openrouteservice.org/optimization"
+
+
+def batch_build(managers: List[OSMRoutingManager]) -> List[Optional[str]]:
+    """
+    Build one OSRM URL per manager from a single joint ORS optimization.
+
+    Each manager becomes one vehicle starting and ending at its own endpoints;
+    its stops become jobs pinned to that vehicle by skill, so no stop moves
+    between technicians. Managers whose joint result is unavailable fall back
+    to their own per-route optimization. A manager whose route cannot be
+    built at all (no stops, origin not geocoded) gets None and is left out
+    of the joint problem without affecting the others.
+
+    Library API for callers routing several technicians at once; the CLI
+    builds each user's route independently.
+    """
+    points: List[Optional[list[tuple[str, list[float]]]]] = []
+    for mgr in managers:
+        try:
+            points.append(mgr._routed_points())
+        except ValueError as e:
+            logger.warning("[ORS] Skipping route from '%s' in batch: %s", mgr.origin, e)
+            points.append(None)
+
+    batched = [i for i, routed in enumerate(points) if routed and len(routed) > 3]
+    orders = _batch_optimize_orders(managers, points, batched) if batched else None
+    joint = dict(zip(batched, orders)) if orders else {}
+
+    urls: List[Optional[str]] = []
+    for i, (mgr, routed) in enumerate(zip(managers, points)):
+        if routed is None:
+            urls.append(None)
+            continue
+        if i in joint:
+            routed = reorder(routed, joint[i])
+        else:
+            routed = mgr._apply_order(routed)
+        urls.append(mgr._viewer_url(routed))
+    return urls
+
+
+def _batch_optimize_orders(
+    managers: List[OSMRoutingManager],
+    points: List[Optional[list[tuple[str, list[float]]]]],
+    batched: List[int],
+) -> Optional[List[List[int]]]:
+    """Return a full point order (start, jobs..., end) for each batched manager, or None."""
+    ors_key = managers[batched[0]].ors_key
+    if not ors_key:
+        return None
+
+    coord_sets = [[point for _, point in points[i]] for i in batched]
+    return BaseRoutingManager._cached_optimization(
+        "ors_batch", coord_sets, lambda: _fetch_batch_orders(ors_key, coord_sets)
+    )
+
+
+def _fetch_batch_orders(ors_key: str, coord_sets: List[List[List[float]]]) -> Optional[List[List[int]]]:
+    """POST every route as one vehicle-routing problem to ORS (uncached)."""
+    vehicles = []
+    jobs = []
+    job_points: list[tuple[int, int]] = []  # job id -> (vehicle, point index)
+    for v, coords in enumerate(coord_sets):
+        vehicles.append(
+            {"id": v, "profile": "driving-car", "start": coords[0], "end": coords[-1], "skills": [v]}
+        )
+        for j in range(1, len(coords) - 1):
+            jobs.append({"id": len(job_points), "location": coords[j], "skills": [v]})
+            job_points.append((v, j))
+
+    try:
+        r = _SESSION.post(
+            ORS_OPTIMIZATION_URL,
+            json={"vehicles": vehicles, "jobs": jobs},
+            headers={"Authorization": ors_key},
+            timeout=20,
+        )
+        if not r.ok:
+            logger.error("[ORS] Batch optimization error: %s %s", r.status_code, r.text)
+            return None
+        routes = r.json().get("routes", [])
+    except Exception as e:
+        logger.exception("[ORS] Exception in batch optimization: %s", e)
+        return None
+
+    orders: List[List[int]] = [[0] for _ in coord_sets]
+    for route in routes:
+        v = route["vehicle"]
+        orders[v].extend(
+            job_points[step["id"]][1] for step in route.get("steps", []) if step.get("type") == "job"
+        )
+
+    for v, coords in enumerate(coord_sets):
+        seen = set(orders[v])
+        missing = [j for j in range(1, len(coords) - 1) if j not in seen]
+        if missing:
+            logger.warning("[ORS] %d stops unassigned for vehicle %d; keeping input order", len(missing), v)
+            orders[v].extend(missing)
+        orders[v].append(len(coords) - 1)
+
+    logger.info("[ORS] Optimized %d routes in one batch request", len(coord_sets))
+    return orders
@@ -10,7 +10,7 @@ from datetime import date
 from optimized_routing.bluefolder_integration import BlueFolderIntegration
 from optimized_routing.config import settings
 from optimized_routing.routing import (
-    bluefolder_to_routestops,
+    bluefolder_to_unique_routestops,
     shorten_route_url,
     generate_route_for_provider,
 )
@@ -34,7 +34,7 @@ def route_my_calls():
         return
 
     # 2️⃣ Convert to RouteStop objects
-    stops = bluefolder_to_routestops(assignments)
+    stops = bluefolder_to_unique_routestops(assignments)
 
     print("📌 Stops for today:")
     for s in stops:
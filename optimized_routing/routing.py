@@ -9,18 +9,43 @@ Responsibilities:
     - Pass stops to provider-specific managers for optimized routing.
 """
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
-import requests
+from functools import lru_cache, partial
+from importlib import import_module
+from typing import Callable, Dict, Iterable, List, Optional
 from optimized_routing.bluefolder_integration import BlueFolderIntegration
-from optimized_routing.manager.base import RouteStop, ServiceWindow
-from optimized_routing.config import RouteConfig, settings
+from optimized_routing.manager.base import RouteStop, ServiceWindow, cache_key
+from optimized_routing.config import settings
 from optimized_routing.utils.cache_manager import CacheManager
+from optimized_routing.utils.http import build_session
 
 logger = logging.getLogger(__name__)
 
 
 short_cache = CacheManager("short_urls", ttl_minutes=24 * 60)
+
+SHORTEN_WORKERS = 8
+
+# One keep-alive pool to the Worker host, sized so every shorten thread keeps its
+# socket. Connection errors and 429/5xx are retried by urllib3 with backoff,
+# below the Python call, so a retry re-sends the request without re-entering this module.
+_SHORTENER_SESSION = build_session(
+    pool_connections=1,
+    pool_maxsize=SHORTEN_WORKERS,
+    retries=2,
+    backoff_factor=0.25,
+    allowed_methods=("POST",),
+)
+
+# determine_service_window runs once per assignment; module globals skip the attribute lookups.
+_AM, _PM, _ALL_DAY = ServiceWindow.AM, ServiceWindow.PM, ServiceWindow.ALL_DAY
+_fromisoformat = datetime.fromisoformat
+# Strict "YYYY-MM-DD[T ]HH:MM[:SS[.ffffff]][Z|±HH:MM]"; group 1 is the hour.
+# Anything else (e.g. BlueFolder's 12-hour "YYYY.MM.DD hh:mm AM") takes the full parser.
+_ISO_HOUR_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ](\d{2}):\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?")
+
 CF_SHORTENER_URL = settings.cf_shortener_url
 
 # ---------------------------------------------------------------------------
@@ -28,41 +53,99 @@ CF_SHORTENER_URL = settings.cf_shortener_url
 # ---------------------------------------------------------------------------
 
 
-def shorten_route_url(long_url: str) -> str:
+@lru_cache(maxsize=1024)
+def _short_key(long_url: str) -> str:
     """
-    Hit Cloudflare Worker shortener to convert a long Google Maps route URL.
-    Returns short URL, or original URL if anything fails.
+    Fixed-size short_cache key; route URLs run to several kB and would bloat the
+    cache file. Memoized so a URL shortened again skips re-hashing its bytes.
     """
-    cached = short_cache.get(long_url)
-    if cached:
-        return cached
+    return cache_key("short", (long_url,))
+
+
+def _post_shortener(shortener_url: str, long_url: str):
+    """POST to the Worker; the session retries connection errors and 429/5xx."""
+    return _SHORTENER_SESSION.post(f"{shortener_url.rstrip('/')}/new", json={"url": long_url}, timeout=6)
 
-    shortener_url = settings.cf_shortener_url or CF_SHORTENER_URL
-    if not shortener_url:
-        logger.info("[SHORTENER] CF_SHORTENER_URL not set — returning long URL")
-        short_cache.set(long_url, long_url)
-        return long_url
 
+def _request_short_url(shortener_url: str, long_url: str) -> Optional[str]:
+    """POST one URL to the Cloudflare Worker and return its short form, if any."""
     try:
-        r = requests.post(f"{shortener_url.rstrip('/')}/new", json={"url": long_url}, timeout=6)
+        r = _post_shortener(shortener_url, long_url)
         if r.ok:
             data = r.json()
             short = data.get("short") if isinstance(data, dict) else None
             if short:
-                logger.info(f"[SHORTENER] Shortened → {short}")
-                short_cache.set(long_url, short)
+                logger.info("[SHORTENER] Shortened → %s", short)
                 return short
             else:
                 logger.warning("[SHORTENER] Response OK but no 'short' key")
         else:
-            logger.error(f"[SHORTENER] POST failed: {r.status_code} {r.text}")
+            logger.error("[SHORTENER] POST failed: %s %s", r.status_code, r.text)
     except Exception as e:
-        logger.exception(f"[SHORTENER] Exception: {e}")
+        logger.exception("[SHORTENER] Exception: %s", e)
+    return None
+
+
+def shorten_route_url(long_url: str) -> str:
+    """
+    Hit Cloudflare Worker shortener to convert a long Google Maps route URL.
+    Returns short URL, or original URL if anything fails.
+    """
+    key = _short_key(long_url)
+    cached = short_cache.get(key)
+    if cached:
+        return cached
+
+    shortener_url = settings.cf_shortener_url or CF_SHORTENER_URL
+    if not shortener_url:
+        logger.info("[SHORTENER] CF_SHORTENER_URL not set — returning long URL")
+        short_cache.set(key, long_url)
+        return long_url
+
+    short = _request_short_url(shortener_url, long_url) or long_url
+    short_cache.set(key, short)
+    return short
+
+
+def shorten_route_urls(long_urls: Iterable[str], max_workers: int = SHORTEN_WORKERS) -> Dict[str, str]:
+    """
+    Shorten a batch of route URLs, returning a `{long_url: short_url}` map.
+
+    Cached and duplicate URLs are answered locally; the remainder are posted to
+    the Worker concurrently and persisted with a single cache write. Any URL
+    that cannot be shortened maps to itself.
+    """
+    keys = {long_url: _short_key(long_url) for long_url in long_urls}
+    cached = short_cache.get_many(keys.values())
+    results: Dict[str, str] = {}
+    pending: List[str] = []
+    for long_url, key in keys.items():
+        short = cached.get(key)
+        if short:
+            results[long_url] = short
+        else:
+            pending.append(long_url)
+
+    if not pending:
+        return results
+
+    shortener_url = settings.cf_shortener_url or CF_SHORTENER_URL
+    if not shortener_url:
+        logger.info("[SHORTENER] CF_SHORTENER_URL not set — returning long URLs")
+        fresh = {long_url: long_url for long_url in pending}
+    else:
+        workers = max(1, min(max_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shorten") as pool:
+            shorts = list(pool.map(partial(_request_short_url, shortener_url), pending))
+        fresh = {long_url: short or long_url for long_url, short in zip(pending, shorts)}
 
-    short_cache.set(long_url, long_url)
-    return long_url
+    short_cache.set_many({keys[long_url]: short for long_url, short in fresh.items()})
+    results.update(fresh)
+    return results
 
 
+# Pure and called per assignment; a technician's AM/PM blocks repeat the same start strings.
+@lru_cache(maxsize=512)
 def determine_service_window(start_time: str) -> ServiceWindow:
     """
     Infer a rough service window (AM, PM, or ALL_DAY) from an ISO datetime string.
@@ -73,17 +156,53 @@ def determine_service_window(start_time: str) -> ServiceWindow:
     Returns:
         ServiceWindow: Enum representing the time block of the service.
     """
-    try:
-        hour = datetime.fromisoformat(start_time).hour
-    except Exception:
-        logger.debug(f"Invalid start_time '{start_time}', defaulting to ALL_DAY")
-        return ServiceWindow.ALL_DAY
+    if not start_time:
+        # Missing start is common; don't pay for raising and catching a ValueError.
+        return _ALL_DAY
+
+    # Fast path: only the hour of a strict ISO datetime matters, so read it
+    # instead of building a datetime. Other shapes take the full parser.
+    match = _ISO_HOUR_RE.fullmatch(start_time) if isinstance(start_time, str) else None
+    if match:
+        hour = int(match.group(1))
+    else:
+        try:
+            hour = _fromisoformat(start_time).hour
+        except Exception:
+            logger.debug("Invalid start_time '%s', defaulting to ALL_DAY", start_time)
+            return _ALL_DAY
 
     if hour < 12:
-        return ServiceWindow.AM
+        return _AM
     elif hour < 17:
-        return ServiceWindow.PM
-    return ServiceWindow.ALL_DAY
+        return _PM
+    return _ALL_DAY
+
+
+def _assignment_fields(a: dict) -> tuple[str, ServiceWindow, str]:
+    """Return the (full address, service window, SR label) of one assignment."""
+    address = a.get("address", "")
+    city = a.get("city", "")
+    state = a.get("state", "")
+    zip_code = a.get("zip", "")
+    state_zip = f"{state} {zip_code}".strip()
+    # Join only the parts that are present, so a missing city never leaves ", ,".
+    full_address = ", ".join(part for part in (address, city, state_zip) if part)
+
+    window = determine_service_window(a.get("start", ""))
+    label = f"SR-{a.get('serviceRequestId', 'N/A')}"
+    return full_address, window, label
+
+
+def _by_window(stops: Iterable[RouteStop]) -> List[RouteStop]:
+    """
+    Stable AM → ALL_DAY → PM ordering. ServiceWindow values are the bucket
+    indexes, so three appends replace a comparison sort.
+    """
+    buckets: tuple[List[RouteStop], List[RouteStop], List[RouteStop]] = ([], [], [])
+    for stop in stops:
+        buckets[stop.window.value].append(stop)
+    return [*buckets[0], *buckets[1], *buckets[2]]
 
 
 def bluefolder_to_routestops(assignments: List[dict]) -> List[RouteStop]:
@@ -97,38 +216,24 @@ def bluefolder_to_routestops(assignments: List[dict]) -> List[RouteStop]:
         - If duplicates exist, we keep the *earliest* service window.
     """
 
-    raw_stops: List[RouteStop] = []
+    unique: Dict[str, RouteStop] = {}
 
+    # One pass: build each stop and keep the earliest window per (label, address).
     for a in assignments:
-        address = a.get("address", "")
-        city = a.get("city", "")
-        state = a.get("state", "")
-        zip_code = a.get("zip", "")
-        full_address = f"{address}, {city}, {state} {zip_code}".strip(" ,")
-
-        window = determine_service_window(a.get("start", ""))
-        label = f"SR-{a.get('serviceRequestId', 'N/A')}"
+        full_address, window, label = _assignment_fields(a)
+        # Single string key (unit separator can't occur in either part): no tuple per row.
+        key = f"{label}\x1f{full_address}"
+        existing = unique.get(key)
+        if existing is None or window.value < existing.window.value:
+            unique[key] = RouteStop(address=full_address, window=window, label=label)
 
-        raw_stops.append(RouteStop(address=full_address, window=window, label=label))
-
-    unique = {}
-
-    for stop in raw_stops:
-        key = (stop.label, stop.address)
-
-        if key not in unique:
-            unique[key] = stop
-        else:
-            # Keep earliest window value
-            if stop.window.value < unique[key].window.value:
-                unique[key] = stop
-
-    # Preserve a consistent order while respecting service windows (AM -> PM -> ALL_DAY)
-    stops = list(unique.values())
-    stops.sort(key=lambda s: s.window.value)
+    # Preserve a consistent order while respecting service windows (AM -> ALL_DAY -> PM)
+    stops = _by_window(unique.values())
 
     logger.debug(
-        f"Converted {len(raw_stops)} assignments → {len(stops)} unique RouteStops."
+        "Converted %s assignments → %s unique RouteStops.",
+        len(assignments),
+        len(stops),
     )
     return stops
 
@@ -138,36 +243,71 @@ def dedupe_stops(stops):
     Remove duplicate stops caused by AM/PM overlapping assignments.
     Two stops are considered identical if they share the same SR ID or same address.
     """
-    seen = set()
-    unique = []
-
+    # Insertion-ordered dict: one hash per stop, and setdefault keeps the first occurrence.
+    unique: Dict[str, RouteStop] = {}
     for s in stops:
         # Use SR ID if present, otherwise normalized address
-        key = s.label or s.address.lower().strip()
+        unique.setdefault(s.label or s._address_key, s)
+    return list(unique.values())
 
-        if key not in seen:
-            unique.append(s)
-            seen.add(key)
 
-    return unique
+def bluefolder_to_unique_routestops(assignments: List[dict]) -> List[RouteStop]:
+    """
+    Single-pass equivalent of `dedupe_stops(bluefolder_to_routestops(assignments))`.
 
+    Stops are keyed like `dedupe_stops` (SR label, else normalized address) and
+    each key keeps its earliest service window; the result is window-sorted.
+    """
+    unique: Dict[str, RouteStop] = {}
+
+    for a in assignments:
+        full_address, window, label = _assignment_fields(a)
+        key = label or full_address.strip().lower()
+        existing = unique.get(key)
+        if existing is None or window.value < existing.window.value:
+            unique[key] = RouteStop(address=full_address, window=window, label=label)
+
+    stops = _by_window(unique.values())
+    logger.debug("Converted %s assignments → %s unique RouteStops.", len(assignments), len(stops))
+    return stops
 
-def _manager_for_provider(provider: str):
-    """Load the routing manager class for the selected provider on demand."""
-    provider = provider.lower()
-    if provider == "geoapify":
-        from optimized_routing.manager.geoapify_manager import GeoapifyRoutingManager
 
-        return GeoapifyRoutingManager
-    if provider == "mapbox":
-        from optimized_routing.manager.mapbox_manager import MapboxRoutingManager
+@lru_cache(maxsize=1)
+def _default_integration() -> BlueFolderIntegration:
+    """Process-wide integration for callers that don't pass `bf`; built on first use."""
+    return BlueFolderIntegration()
+
+
+# provider -> (manager module, manager class, required settings key, env var name).
+# Modules are imported on first use so unused providers never load.
+_PROVIDERS: Dict[str, tuple[str, str, Optional[str], Optional[str]]] = {
+    "geoapify": (
+        "optimized_routing.manager.geoapify_manager",
+        "GeoapifyRoutingManager",
+        "geoapify_api_key",
+        "GEOAPIFY_API_KEY",
+    ),
+    "mapbox": (
+        "optimized_routing.manager.mapbox_manager",
+        "MapboxRoutingManager",
+        "mapbox_api_key",
+        "MAPBOX_API_KEY",
+    ),
+    "osm": ("optimized_routing.manager.osm_manager", "OSMRoutingManager", None, None),
+}
+
+
+def _provider_spec(provider: str) -> tuple[str, str, Optional[str], Optional[str]]:
+    spec = _PROVIDERS.get(provider.lower())
+    if spec is None:
+        raise ValueError(f"Unknown provider '{provider}'")
+    return spec
 
-        return MapboxRoutingManager
-    if provider == "osm":
-        from optimized_routing.manager.osm_manager import OSMRoutingManager
 
-        return OSMRoutingManager
-    raise ValueError(f"Unknown provider '{provider}'")
+def _manager_for_provider(provider: str):
+    """Load the routing manager class for the selected provider on demand."""
+    module_name, class_name, _, _ = _provider_spec(provider)
+    return getattr(import_module(module_name), class_name)
 
 
 # ---------------------------------------------------------------------------
@@ -181,95 +321,93 @@ def generate_route_for_provider(
     origin_address: Optional[str] = None,
     destination_override: Optional[str] = None,
     assignments: Optional[List[dict]] = None,
+    bf: Optional[BlueFolderIntegration] = None,
 ) -> str:
-    """Generate a route URL for the selected provider."""
-    bf = BlueFolderIntegration()
-    assignments = assignments or bf.get_user_assignments_today(user_id)
+    """
+    Generate a route URL for the selected provider.
+    Assignments are only fetched (through `bf`, or a new integration) when not supplied.
+    """
+    if not assignments:
+        bf = bf or _default_integration()
+        assignments = bf.get_user_assignments_today(user_id)
 
     if not assignments:
         logger.warning("No assignments found for user %s", user_id)
         return "No assignments found."
 
-    stops = bluefolder_to_routestops(assignments)
-    stops = dedupe_stops(stops)
+    stops = bluefolder_to_unique_routestops(assignments)
 
     provider = provider.lower()
-    if provider == "geoapify":
-        if not settings.geoapify_api_key:
-            raise ValueError("GEOAPIFY_API_KEY is required for geoapify provider")
-        manager = _manager_for_provider(provider)(
-            origin=origin_address or settings.default_origin,
-            destination_override=destination_override,
-        )
-    elif provider == "mapbox":
-        if not settings.mapbox_api_key:
-            raise ValueError("MAPBOX_API_KEY is required for mapbox provider")
-        manager = _manager_for_provider(provider)(
-            origin=origin_address or settings.default_origin,
-            destination_override=destination_override,
-        )
-    elif provider == "osm":
-        manager = _manager_for_provider(provider)(
-            origin=origin_address or settings.default_origin,
-            destination_override=destination_override,
-        )
-    else:
-        raise ValueError(f"Unknown provider '{provider}'")
+    _, _, key_setting, key_env = _provider_spec(provider)
+    if key_setting and not getattr(settings, key_setting):
+        raise ValueError(f"{key_env} is required for {provider} provider")
+    manager = _manager_for_provider(provider)(
+        origin=origin_address or settings.default_origin,
+        destination_override=destination_override,
+    )
 
     manager.add_stops(stops)
 
     route_url = manager.build_route_url()
-    logger.info(f"[ROUTING] Generated route URL for user {user_id}: {route_url}")
+    logger.info("[ROUTING] Generated route URL for user %s: %s", user_id, route_url)
 
     return route_url
 
 
-def preview_user_stops(user_id: int, origin: Optional[str] = None):
+def preview_user_stops(
+    user_id: int,
+    origin: Optional[str] = None,
+    bf: Optional[BlueFolderIntegration] = None,
+    emit: Optional[Callable[[str], None]] = None,
+):
     """
     CLI helper:
       - Shows enriched assignments
       - Shows deduped RouteStops
       - Shows final ordered stop list
       - Displays route URL (if available)
+
+    Output goes through `emit` (default: print, one call per line) so
+    concurrent previews can buffer their lines instead of interleaving.
     """
 
-    bf = BlueFolderIntegration()
+    emit = emit or print
+    bf = bf or _default_integration()
     assignments = bf.get_user_assignments_today(user_id)
 
-    print("\n================= RAW ASSIGNMENTS =================")
+    emit("\n================= RAW ASSIGNMENTS =================")
     if not assignments:
-        print(f"[NO ASSIGNMENTS] User {user_id} has no scheduled work today.")
-        print("===================================================\n")
+        emit(f"[NO ASSIGNMENTS] User {user_id} has no scheduled work today.")
+        emit("===================================================\n")
         return None
 
     for a in assignments:
-        print(a)
+        emit(str(a))
 
     # Build deduped stops
-    stops = bluefolder_to_routestops(assignments)
-    stops = dedupe_stops(stops)
+    stops = bluefolder_to_unique_routestops(assignments)
 
-    print("\n================= ROUTE STOPS =================")
+    emit("\n================= ROUTE STOPS =================")
     if not stops:
-        print(
+        emit(
             f"[NO VALID STOPS] User {user_id} had assignments but they could not be converted."
         )
-        print("===================================================\n")
+        emit("===================================================\n")
         return None
 
     for s in stops:
-        print(f"- {s.label} | {s.window.name} | {s.address}")
+        emit(f"- {s.label} | {s.window.name} | {s.address}")
 
     mgr = _manager_for_provider("geoapify")(origin=origin or "South Paris, ME")
     mgr.add_stops(stops)
 
-    print("\n================= ROUTE URL =================")
+    emit("\n================= ROUTE URL =================")
     try:
         url = mgr.build_route_url()
-        print(url)
+        emit(url)
     except Exception as e:
-        print("[ERROR] Could not generate route:", e)
+        emit(f"[ERROR] Could not generate route: {e}")
         url = None
 
-    print("===================================================\n")
+    emit("===================================================\n")
     return url
@@ -1,11 +1,21 @@
-"""Lightweight JSON-backed cache with TTL expiry and atomic persistence."""
+"""Lightweight JSON-backed cache with TTL expiry, an append-only write log and atomic compaction."""
 
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import mmap
+import os
 from pathlib import Path
+import threading
 import time
+import weakref
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +23,51 @@ logger = logging.getLogger(__name__)
 # Configuration
 # ---------------------------------------------------------------------------
 
-CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+# OPTIMIZED_ROUTING_CACHE_DIR relocates every cache (e.g. to a scratch directory for tests).
+CACHE_DIR = Path(os.getenv("OPTIMIZED_ROUTING_CACHE_DIR") or Path(__file__).resolve().parent / ".cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 DEFAULT_TTL_MINUTES = 30
+# Fold the append-only log back into the JSON snapshot once it grows past this.
+COMPACT_LOG_BYTES = 1024 * 1024
+# fsync snapshots before the rename. Off by default: a snapshot lost to power
+# failure only costs refetches, while fsync stalls every compaction on the disk.
+FSYNC_SNAPSHOTS = False
+# Below this size a plain read is cheaper than setting up (and tearing down) a mapping.
+MMAP_MIN_BYTES = 64 * 1024
+
+
+# Live caches, flushed by one exit hook; weak so short-lived instances can be collected.
+_INSTANCES: "weakref.WeakSet[CacheManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    """Persist deferred writes and evictions of every live cache at interpreter exit."""
+    for cache in list(_INSTANCES):
+        cache.flush()
+
+
+def _dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(blob):
+    return orjson.loads(blob) if orjson else json.loads(blob)
+
+
+def _load_file(path: Path):
+    """Parse a JSON file; with orjson, large files straight from a read-only mapping (no bytes copy)."""
+    with path.open("rb") as fp:
+        if orjson is None:
+            return json.load(fp)
+        # Also keeps empty files away from mmap, which cannot map zero bytes.
+        if os.fstat(fp.fileno()).st_size < MMAP_MIN_BYTES:
+            return orjson.loads(fp.read())
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            return orjson.loads(view)
 
 
 # ---------------------------------------------------------------------------
@@ -34,17 +85,23 @@ class CacheManager:
     Attributes:
         name (str): Cache namespace (creates `{name}.json` under `.cache/`).
         ttl (int): Cache time-to-live in seconds.
-        file_path (str): Path to the JSON file backing this cache.
+        file_path (str): Path to the JSON snapshot backing this cache.
+        log_path (str): Path to the append-only log of writes since the snapshot.
         data (dict): In-memory dictionary of cached entries.
 
     JSON File Structure:
         {
-            "data": {
-                "key1": [timestamp, value],
-                "key2": [timestamp, value]
-            },
-            "timestamp": <last_saved_time>
+            "key1": [timestamp, value],
+            "key2": [timestamp, value]
         }
+
+    The snapshot's mtime is its last-saved time. Snapshots in the older
+    `{"data": {...}, "timestamp": ...}` envelope are still read.
+
+    Writes append one `{"k": key, "t": timestamp, "v": value}` line to
+    `{name}.log` instead of rewriting the snapshot; loading replays the log
+    over the snapshot, and the log is compacted into the snapshot once it
+    exceeds COMPACT_LOG_BYTES.
     """
 
     def __init__(self, name: str, ttl_minutes: int = DEFAULT_TTL_MINUTES):
@@ -58,39 +115,143 @@ class CacheManager:
         self.name = name
         self.ttl = ttl_minutes * 60
         self.file_path = CACHE_DIR / f"{name}.json"
+        self.log_path = CACHE_DIR / f"{name}.log"
+        # The log as of the snapshot being written; removed once that snapshot lands.
+        self.compacting_path = CACHE_DIR / f"{name}.log.compacting"
+        self._log_bytes = 0
         self.data = self._load()
+        self._dirty = False
+        # Routing runs fan users out across threads; serialize writers.
+        self._lock = threading.RLock()
+        # Serializes whole snapshots (taken before _lock, never while holding it)
+        # so encoding and writing one doesn't block get()/set() on _lock.
+        self._save_lock = threading.Lock()
+        # Evictions and deferred writes are persisted lazily; don't lose them at exit.
+        _INSTANCES.add(self)
 
-        logger.debug(f"[CACHE] Initialized '{self.name}' at {self.file_path}")
+        logger.debug("[CACHE] Initialized '%s' at %s", self.name, self.file_path)
 
     # -----------------------------------------------------------------------
     # Internal File Operations
     # -----------------------------------------------------------------------
 
     def _load(self) -> dict:
-        """Load cache data from disk."""
-        if not self.file_path.exists():
-            return {}
-
+        """Load the snapshot from disk, then replay the write log over it."""
+        data: dict = {}
+        # Open directly rather than exists()-then-open: one filesystem lookup per file.
         try:
-            raw = json.loads(self.file_path.read_text(encoding="utf-8"))
-            payload = raw.get("data", {})
+            raw = _load_file(self.file_path)
+            # Entries are [timestamp, value] lists, so a dict under "data" can
+            # only be the legacy envelope.
+            payload = raw.get("data") if isinstance(raw, dict) and isinstance(raw.get("data"), dict) else raw
             if isinstance(payload, dict):
-                return payload
-            logger.warning("[CACHE] Ignoring malformed payload in '%s'", self.name)
+                data = payload
+            else:
+                logger.warning("[CACHE] Ignoring malformed payload in '%s'", self.name)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("[CACHE] Failed to load '%s': %s", self.name, e)
+
+        # A log left mid-compaction predates the live log, so it replays first.
+        self._replay(self.compacting_path, data)
+        self._log_bytes = self._replay(self.log_path, data)
+        return data
+
+    def _replay(self, path: Path, data: dict) -> int:
+        """Apply the write log at `path` to `data`; return its size in bytes."""
+        try:
+            blob = path.read_bytes()
+            for line in blob.splitlines():
+                try:
+                    record = _loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted append; skip it.
+                    continue
+                data[str(record["k"])] = [record["t"], record["v"]]
+            return len(blob)
+        except FileNotFoundError:
+            return 0
         except Exception as e:
-            logger.warning(f"[CACHE] Failed to load '{self.name}': {e}")
-        return {}
+            logger.warning("[CACHE] Failed to replay log for '%s': %s", self.name, e)
+            return 0
+
+    def _rotate_log(self) -> None:
+        """
+        Move the live log aside (caller holds `_lock`) so appends made while a
+        snapshot is written start a fresh log that replays after it.
+        """
+        try:
+            if self.compacting_path.exists():
+                # An earlier compaction failed; its entries are still unsaved.
+                with self.compacting_path.open("ab") as fp:
+                    fp.write(self.log_path.read_bytes())
+                self.log_path.unlink()
+            else:
+                self.log_path.replace(self.compacting_path)
+        except FileNotFoundError:
+            pass
+        self._log_bytes = 0
 
     def _save(self) -> None:
-        """Persist cache data to disk."""
+        """
+        Write a full snapshot to disk and truncate the write log (compaction).
+
+        Only the copy of `data` happens under `_lock`; encoding and the file
+        write run outside it. Callers must not hold `_lock`.
+        """
+        with self._save_lock:
+            with self._lock:
+                # Compaction doubles as the expiry sweep: stale entries never reach the snapshot.
+                now = time.time()
+                snapshot = {key: entry for key, entry in self.data.items() if now - entry[0] <= self.ttl}
+                self.data = dict(snapshot)
+                self._dirty = False
+                self._rotate_log()
+            try:
+                payload = _dumps(snapshot)
+                # Per-process temp name only keeps two writers from interleaving
+                # bytes in one temp file. The cache is NOT multi-process safe:
+                # compaction drops log lines another process appended after our
+                # copy, so share CACHE_DIR between processes read-mostly at best.
+                temp_path = self.file_path.with_suffix(f"{self.file_path.suffix}.{os.getpid()}.tmp")
+                try:
+                    with temp_path.open("wb") as fp:
+                        fp.write(payload)
+                        if FSYNC_SNAPSHOTS:
+                            fp.flush()
+                            os.fsync(fp.fileno())
+                    temp_path.replace(self.file_path)
+                except BaseException:
+                    temp_path.unlink(missing_ok=True)
+                    raise
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                logger.warning("[CACHE] Failed to save '%s': %s", self.name, e)
+                return
+
+            # The snapshot holds everything the rotated log did; appends since
+            # the copy are in the live log, which replays over it.
+            self.compacting_path.unlink(missing_ok=True)
+        logger.debug("[CACHE] Saved '%s' (%s entries)", self.name, len(snapshot))
+
+    def _append(self, entries: dict) -> None:
+        """Append `{key: (timestamp, value)}` to the write log, compacting when it grows large."""
         try:
-            payload = json.dumps({"data": self.data, "timestamp": time.time()}, indent=2)
-            temp_path = self.file_path.with_suffix(f"{self.file_path.suffix}.tmp")
-            temp_path.write_text(payload, encoding="utf-8")
-            temp_path.replace(self.file_path)
-            logger.debug(f"[CACHE] Saved '{self.name}' ({len(self.data)} entries)")
+            payload = b"".join(
+                _dumps({"k": key, "t": ts, "v": value}) + b"\n" for key, (ts, value) in entries.items()
+            )
+            with self._lock:
+                with self.log_path.open("ab") as fp:
+                    fp.write(payload)
+                self._log_bytes += len(payload)
+                compact = self._log_bytes > COMPACT_LOG_BYTES
         except Exception as e:
-            logger.warning(f"[CACHE] Failed to save '{self.name}': {e}")
+            logger.warning("[CACHE] Failed to append to '%s': %s", self.name, e)
+            return
+        if compact:
+            self._save()
 
     # -----------------------------------------------------------------------
     # Public Cache API
@@ -106,37 +267,109 @@ class CacheManager:
         Returns:
             Any | None: The cached value, or None if not found or expired.
         """
-        entry = self.data.get(str(key))
+        # Keys are almost always str already; skip the str() call for them.
+        key = key if type(key) is str else str(key)
+        entry = self.data.get(key)
         if not entry:
             return None
 
         ts, value = entry
         if time.time() - ts > self.ttl:
-            # Expired — remove and ignore
-            logger.debug(f"[CACHE] Expired key '{key}' in '{self.name}'")
-            del self.data[str(key)]
-            self._save()
+            # Expired — evict in memory only; the next set() or flush() persists it.
+            logger.debug("[CACHE] Expired key '%s' in '%s'", key, self.name)
+            with self._lock:
+                self.data.pop(key, None)
+                self._dirty = True
             return None
 
         return value
 
-    def set(self, key: str, value) -> None:
+    def get_many(self, keys) -> dict:
+        """
+        Retrieve several values with one clock read.
+
+        Args:
+            keys (Iterable[str]): Keys to retrieve.
+
+        Returns:
+            dict: `{key: value}` for keys that are present and unexpired; misses are omitted.
+        """
+        now = time.time()
+        found = {}
+        expired = []
+        for key in keys:
+            key = key if type(key) is str else str(key)
+            entry = self.data.get(key)
+            if not entry:
+                continue
+            if now - entry[0] > self.ttl:
+                expired.append(key)
+            else:
+                found[key] = entry[1]
+        if expired:
+            logger.debug("[CACHE] Expired %s keys in '%s'", len(expired), self.name)
+            with self._lock:
+                for key in expired:
+                    self.data.pop(key, None)
+                self._dirty = True
+        return found
+
+    def set(self, key: str, value, flush: bool = True) -> None:
         """
-        Store a value and persist it to disk immediately.
+        Store a value and, by default, persist it to disk immediately.
 
         Args:
             key (str): The key under which to store the value.
             value (Any): The value to cache.
+            flush (bool): Write to disk now; pass False to defer until `flush()`.
+        """
+        key = key if type(key) is str else str(key)
+        with self._lock:
+            entry = self.data[key] = (time.time(), value)
+            # Pending evictions/deferred writes: one snapshot covers them all.
+            snapshot = flush and self._dirty
+            if not flush:
+                self._dirty = True
+        if snapshot:
+            self._save()
+        elif flush:
+            self._append({key: entry})
+        logger.debug("[CACHE] Stored key '%s' in '%s'", key, self.name)
+
+    def set_many(self, mapping: dict) -> None:
         """
-        self.data[str(key)] = (time.time(), value)
-        self._save()
-        logger.info(f"[CACHE] Stored key '{key}' in '{self.name}'")
+        Store several values and persist them with a single log append.
+
+        Args:
+            mapping (dict): Keys and values to cache.
+        """
+        if not mapping:
+            return
+        now = time.time()
+        entries = {str(key): (now, value) for key, value in mapping.items()}
+        with self._lock:
+            self.data.update(entries)
+            snapshot = self._dirty
+        if snapshot:
+            self._save()
+        else:
+            self._append(entries)
+        logger.debug("[CACHE] Stored %s keys in '%s'", len(mapping), self.name)
+
+    def flush(self) -> None:
+        """Persist deferred writes (`set(..., flush=False)`) and expiry evictions."""
+        if self._dirty:
+            self._save()
 
     def clear(self) -> None:
         """
         Clear all entries in this cache and delete the cache file.
         """
-        self.data = {}
-        if self.file_path.exists():
-            self.file_path.unlink()
-        logger.info(f"[CACHE] Cleared '{self.name}'")
+        with self._save_lock, self._lock:
+            self.data = {}
+            self._dirty = False
+            self._log_bytes = 0
+            self.file_path.unlink(missing_ok=True)
+            self.log_path.unlink(missing_ok=True)
+            self.compacting_path.unlink(missing_ok=True)
+        logger.info("[CACHE] Cleared '%s'", self.name)
@@ -0,0 +1,47 @@
+"""Pooled keep-alive `requests` sessions shared by the routing providers."""
+
+from __future__ import annotations
+
+from typing import Collection
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "optimized-routing-extension"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def build_session(
+    *,
+    pool_connections: int = 4,
+    pool_maxsize: int = 16,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+    allowed_methods: Collection[str] = ("GET",),
+) -> requests.Session:
+    """
+    Return a session that reuses TLS connections and retries 429/5xx and
+    connection errors with jittered exponential backoff (honoring Retry-After).
+    The final response is returned rather than raised so callers can log it.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        backoff_max=30.0,
+        backoff_jitter=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(allowed_methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
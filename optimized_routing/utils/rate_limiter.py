@@ -0,0 +1,50 @@
+"""Process-wide client-side rate limiting for provider APIs."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursting to `capacity`.
+
+    `acquire()` blocks until a token is available, so concurrent route builders
+    wait locally instead of spending round trips on 429s. `penalize()` halves
+    the refill rate for a while after the server pushes back anyway.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._penalty_until = 0.0
+        self._cond = threading.Condition()
+
+    def _current_rate(self, now: float) -> float:
+        return self.rate / 2 if now < self._penalty_until else self.rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self._current_rate(now))
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until the bucket has refilled enough."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._cond.wait((1 - self._tokens) / self._current_rate(now))
+
+    def penalize(self, seconds: float = 60.0) -> None:
+        """Halve the refill rate for `seconds` (e.g. after a 429 slipped through)."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            self._penalty_until = max(self._penalty_until, now + seconds)
@@ -0,0 +1,47 @@
+"""Coalesce concurrent identical calls so only one reaches the network."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Share one in-flight call among every thread asking for the same key.
+
+    The first caller for a key runs `fn`; callers arriving while it is still
+    running block on its result instead of issuing a duplicate request.
+    Nothing is remembered once the call completes — pair with a cache for that.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run `fn` once per concurrent `key` and return its result to all callers."""
+        with self._lock:
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._pending[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
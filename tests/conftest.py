@@ -3,8 +3,14 @@
 import sys, os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import tempfile
+
 import pytest
 
+# Module-level caches are built at import (some test modules shorten URLs at
+# collection time), so the package cache directory must be redirected first.
+os.environ["OPTIMIZED_ROUTING_CACHE_DIR"] = tempfile.mkdtemp(prefix="optimized-routing-cache-")
+
 # Stub dotenv if missing
 if "dotenv" not in sys.modules:
     sys.modules["dotenv"] = type("dotenv", (), {"load_dotenv": lambda *a, **k: None})
@@ -25,6 +31,13 @@ if "requests" not in sys.modules:
     class DummySession:
         def __init__(self):
             self.calls = []
+            self.headers = {}
+
+        def mount(self, prefix, adapter):
+            return None
+
+        def close(self):
+            return None
 
         def post(self, url, data=None, headers=None, timeout=None, json=None, params=None):
             self.calls.append({"url": url, "data": data, "headers": headers, "json": json, "params": params})
@@ -42,34 +55,26 @@ if "requests" not in sys.modules:
     })
     sys.modules["requests"] = requests
 
+    class DummyAdapter:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    sys.modules["requests.adapters"] = type("requests.adapters", (), {"HTTPAdapter": DummyAdapter})
+
 if "bluefolder_api" not in sys.modules:
     fake_module = type("bluefolder_api", (), {})
     fake_client_module = type("bluefolder_api.client", (), {"BlueFolderClient": object})
     sys.modules["bluefolder_api"] = fake_module
     sys.modules["bluefolder_api.client"] = fake_client_module
 
-if "tenacity" not in sys.modules:
-    # Minimal stubs for decorators used in routing managers
-    def _noop(fn):
-        return fn
-    sys.modules["tenacity"] = type(
-        "tenacity",
-        (),
-        {
-            "retry": lambda *a, **k: _noop,
-            "stop_after_attempt": lambda *a, **k: None,
-            "wait_exponential": lambda *a, **k: None,
-        },
-    )
-
 if "pydantic" not in sys.modules:
     class BaseModel:
         def __init__(self, **kwargs):
             for k, v in kwargs.items():
                 setattr(self, k, v)
 
-    def Field(default=None, **kwargs):
-        return default
+    def Field(default=None, default_factory=None, **kwargs):
+        return default_factory() if default_factory is not None else default
 
     def validator(*args, **kwargs):
         def decorator(fn):
@@ -97,3 +102,29 @@ def patch_env(monkeypatch):
     except Exception:
         # Tests may stub out config; ignore failures here.
         pass
+
+    # Tests swap in their own BlueFolderIntegration; never reuse one across tests.
+    try:
+        from optimized_routing import routing
+
+        routing._default_integration.cache_clear()
+    except Exception:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolate_caches(monkeypatch, tmp_path):
+    """Point every CacheManager at a per-test directory so no test reads or writes the package cache."""
+    from optimized_routing.utils import cache_manager
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", cache_dir)
+    # Module-level caches were built at import time against the real directory.
+    for cache in list(cache_manager._INSTANCES):
+        monkeypatch.setattr(cache, "file_path", cache_dir / cache.file_path.name)
+        monkeypatch.setattr(cache, "log_path", cache_dir / cache.log_path.name)
+        monkeypatch.setattr(cache, "compacting_path", cache_dir / cache.compacting_path.name)
+        monkeypatch.setattr(cache, "data", {})
+        monkeypatch.setattr(cache, "_dirty", False)
+        monkeypatch.setattr(cache, "_log_bytes", 0)
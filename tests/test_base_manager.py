@@ -0,0 +1,199 @@
+from optimized_routing.manager.base import BaseRoutingManager, RouteStop, ServiceWindow
+
+
+class _Manager(BaseRoutingManager):
+    def build_route_url(self) -> str:
+        return ""
+
+
+def test_deduplicate_stops_merges_repeats_in_one_pass():
+    first = RouteStop("1 Main St", ServiceWindow.PM, label="SR-1")
+    mgr = _Manager(origin="Origin")
+    mgr.add_stops(
+        [
+            first,
+            RouteStop("9 Elm St", ServiceWindow.ALL_DAY, label="SR-2"),
+            RouteStop(" 1 main st ", ServiceWindow.AM, label="SR-3"),
+            RouteStop("1 MAIN ST", ServiceWindow.ALL_DAY),
+        ]
+    )
+
+    unique = mgr.deduplicate_stops()
+
+    assert [s.address for s in unique] == ["1 Main St", "9 Elm St"]
+    merged = unique[0]
+    assert merged.window is ServiceWindow.AM
+    assert merged.job_count == 3
+    assert merged.label == "SR-1, SR-3 (3 jobs)"
+    # The caller's original stop is left untouched.
+    assert first.label == "SR-1" and first.job_count == 1
+
+
+def test_grouped_and_ordered_stops_bucket_by_window():
+    mgr = _Manager(origin="Origin")
+    mgr.add_stops(
+        [
+            RouteStop("pm-1", ServiceWindow.PM),
+            RouteStop("am-1", ServiceWindow.AM),
+            RouteStop("all-1", ServiceWindow.ALL_DAY),
+            RouteStop("am-2", ServiceWindow.AM),
+        ]
+    )
+
+    assert [s.address for s in mgr.ordered_stops()] == ["am-1", "am-2", "all-1", "pm-1"]
+    assert [[s.address for s in g] for g in mgr.grouped_stops()] == [
+        ["am-1", "am-2"],
+        ["all-1"],
+        ["pm-1"],
+    ]
+
+
+def test_single_window_routes_keep_their_order():
+    mgr = _Manager(origin="Origin")
+    mgr.add_stops([RouteStop("pm-2", ServiceWindow.PM), RouteStop("pm-1", ServiceWindow.PM)])
+
+    assert [s.address for s in mgr.ordered_stops()] == ["pm-2", "pm-1"]
+    assert [[s.address for s in g] for g in mgr.grouped_stops()] == [["pm-2", "pm-1"]]
+    assert _Manager(origin="Origin").grouped_stops() == []
+
+
+def test_geocode_concurrently_dedupes_and_skips_empty():
+    calls = []
+
+    def geocode(addr):
+        calls.append(addr)
+        return addr.upper()
+
+    result = _Manager._geocode_concurrently(geocode, ["a", None, "b", "a", "", "A."])
+
+    assert result == {"a": "A", "b": "B", "A.": "A"}
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_normalize_address_folds_formatting_variants():
+    from optimized_routing.manager.base import normalize_address
+
+    assert normalize_address("  12 Main  St,\tParis, ME. ") == "12 main st, paris, me"
+    assert normalize_address("12 MAIN ST, PARIS, ME") == normalize_address("12 main st,  paris, me;")
+    assert (
+        normalize_address("14 Maple Ln, Harpswell,ME,USA")
+        == normalize_address("14 Maple Ln, Harpswell, ME, USA")
+        == normalize_address("14 Maple Ln , Harpswell, ME")
+        == "14 maple ln, harpswell, me"
+    )
+
+
+def test_normalize_address_folds_usps_suffixes_and_directionals():
+    from optimized_routing.manager.base import normalize_address
+
+    assert (
+        normalize_address("5 North Elm Avenue, Portland, ME")
+        == normalize_address("5 N. Elm Ave., Portland, ME")
+        == "5 n elm ave, portland, me"
+    )
+    assert normalize_address("12 Maine Street") == "12 maine st"
+
+
+def test_cached_geocode_uses_provider_prefixed_normalized_key(monkeypatch):
+    from optimized_routing.manager import base
+
+    store = {}
+    monkeypatch.setattr(base.geocode_cache, "get", store.get)
+    monkeypatch.setattr(base.geocode_cache, "set", store.__setitem__)
+    fetches = []
+
+    def fetch(addr):
+        fetches.append(addr)
+        return [-70.1, 44.1]
+
+    assert _Manager._cached_geocode("osm", "123 Main St.", fetch) == [-70.1, 44.1]
+    assert _Manager._cached_geocode("osm", "123  main st", fetch) == [-70.1, 44.1]
+    assert fetches == ["123 Main St."]
+    assert list(store) == ["osm:123 main st"]
+
+
+def test_cached_optimization_keys_on_ordered_coordinates(monkeypatch):
+    from optimized_routing.manager import base
+
+    store = {}
+    monkeypatch.setattr(base.route_cache, "get", store.get)
+    monkeypatch.setattr(base.route_cache, "set", store.__setitem__)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return [0, 2, 1]
+
+    coords = [[-70.0, 44.0], [-70.1, 44.1], [-70.2, 44.2]]
+    assert _Manager._cached_optimization("ors", coords, fetch) == [0, 2, 1]
+    assert _Manager._cached_optimization("ors", [list(c) for c in coords], fetch) == [0, 2, 1]
+    assert len(calls) == 1
+
+    _Manager._cached_optimization("ors", coords[::-1], fetch)
+    assert len(calls) == 2
+
+
+def test_deduplicate_stops_reuses_result_until_stops_change():
+    mgr = _Manager(origin="Origin")
+    mgr.add_stops([RouteStop("1 Main St", ServiceWindow.AM), RouteStop("1 main st", ServiceWindow.PM)])
+
+    mgr.stops = mgr.deduplicate_stops()
+    assert mgr.deduplicate_stops() is mgr.stops
+
+    mgr.add_stop(RouteStop("2 Oak St", ServiceWindow.PM))
+    assert [s.address for s in mgr.deduplicate_stops()] == ["1 Main St", "2 Oak St"]
+
+
+def test_cache_key_is_stable_and_order_sensitive():
+    import hashlib
+
+    from optimized_routing.manager.base import cache_key
+
+    key = cache_key("ors_opt", [[-70.0, 44.0], [-70.1, 44.1]])
+    assert key == "ors_opt_" + hashlib.blake2b(
+        b"[-70.0, 44.0]|[-70.1, 44.1]", digest_size=16
+    ).hexdigest()
+    assert key != cache_key("ors_opt", [[-70.1, 44.1], [-70.0, 44.0]])
+
+
+def test_reorder_handles_single_and_multiple_indices():
+    from optimized_routing.manager.base import reorder
+
+    assert reorder(["a", "b", "c"], [2, 0, 1]) == ["c", "a", "b"]
+    assert reorder(["a", "b"], [1]) == ["b"]
+    assert reorder(["a"], []) == []
+
+
+def test_cached_optimization_coalesces_concurrent_misses(monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from optimized_routing.manager import base
+
+    store = {}
+    monkeypatch.setattr(base.route_cache, "get", store.get)
+    monkeypatch.setattr(base.route_cache, "set", store.__setitem__)
+
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(timeout=2)
+        return [0, 1, 2]
+
+    coords = [[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(base.BaseRoutingManager._cached_optimization, "test", coords, fetch)
+            for _ in range(4)
+        ]
+        while not calls:
+            time.sleep(0.001)
+        time.sleep(0.05)  # let the other builders reach the in-flight call
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert results == [[0, 1, 2]] * 4
+    assert len(calls) == 1
@@ -40,3 +40,181 @@ def test_get_appointments_filters_and_parses(integration):
     appts = integration.get_appointments(7, "2025-11-06")
     assert appts[0]["id"] == 42
     assert appts[0]["city"] == "Portland"
+
+
+def test_list_users_full_streams_xml_chunks():
+    payload = (
+        b"<response><user><userId>1</userId><firstName> Ann </firstName></user>"
+        b"<user><userId>2</userId><firstName/></user></response>"
+    )
+
+    closed = []
+
+    class StreamResp:
+        def __init__(self, body):
+            self.body = body
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            closed.append(self.body)
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size):
+            for i in range(0, len(self.body), 16):
+                yield self.body[i : i + 16]
+
+    class Session:
+        body = payload
+
+        def post(self, url, **kwargs):
+            assert kwargs["stream"] is True
+            return StreamResp(self.body)
+
+    session = Session()
+    client = type("C", (), {"base_url": "https://bf.test", "api_key": "k", "session": session})()
+    users = BlueFolderIntegration(client).list_users_full()
+
+    assert users == [
+        {"userId": "1", "firstName": "Ann"},
+        {"userId": "2", "firstName": None},
+    ]
+    assert closed == [payload]
+
+    # A payload that breaks mid-stream still releases the connection.
+    session.body = b"<response><user><userId>1</user"
+    assert not BlueFolderIntegration(client).list_users_full()
+    assert closed == [payload, session.body]
+
+
+def test_active_users_and_origins_are_cached(monkeypatch):
+    from optimized_routing import bluefolder_integration as bfi
+
+    bfi.users_cache.clear()
+    bfi.origin_cache.clear()
+    calls = {"active": 0, "user": 0}
+
+    class Users:
+        def list_active(self):
+            calls["active"] += 1
+            return [{"id": "9", "firstName": "Tech"}]
+
+        def get_by_id(self, uid):
+            calls["user"] += 1
+            return {"userId": uid, "addressWork_City": "Gray", "addressWork_State": "ME"}
+
+    bf = BlueFolderIntegration(type("C", (), {"users": Users()})())
+
+    assert bf.get_active_users()[0]["userId"] == "9"
+    assert bf.get_active_users()[0]["userId"] == "9"
+    assert bf.get_user_origin_address(9) == "Gray, ME"
+    assert bf.get_user_origin_address(9) == "Gray, ME"
+    assert calls == {"active": 1, "user": 1}
+
+    bfi.users_cache.clear()
+    bfi.origin_cache.clear()
+
+
+def test_user_origins_bulk_uses_one_full_list_call(monkeypatch):
+    from optimized_routing import bluefolder_integration as bfi
+
+    bfi.origin_cache.clear()
+    calls = {"full": 0}
+
+    def fake_full():
+        calls["full"] += 1
+        return [
+            {"userId": "1", "addressWork_Street": "1 Main", "addressWork_City": "Gray"},
+            {"userId": "2", "addressHome_City": "Paris", "addressHome_State": "ME"},
+            {"userId": "3"},
+        ]
+
+    bf = BlueFolderIntegration(object())
+    monkeypatch.setattr(bf, "list_users_full", fake_full)
+
+    origins = bf.get_user_origins_bulk([1, 2, 3])
+
+    assert origins == {1: "1 Main, Gray", 2: "Paris, ME"}
+    assert calls["full"] == 1
+    assert bf.get_user_origin_address(2) == "Paris, ME"
+
+    bfi.origin_cache.clear()
+
+
+def test_user_origins_bulk_falls_back_per_user(monkeypatch):
+    from optimized_routing import bluefolder_integration as bfi
+
+    bfi.origin_cache.clear()
+    bf = BlueFolderIntegration(object())
+    looked_up = []
+
+    def fake_origin(uid):
+        looked_up.append(uid)
+        return f"{uid} Elm St"
+
+    def failing_full():
+        raise RuntimeError("list.aspx timed out")
+
+    monkeypatch.setattr(bf, "get_user_origin_address", fake_origin)
+    monkeypatch.setattr(bf, "list_users_full", failing_full)
+    assert bf.get_user_origins_bulk([1, 2]) == {1: "1 Elm St", 2: "2 Elm St"}
+    assert sorted(looked_up) == ["1", "2"]
+
+    # Users absent from a successful list are looked up; listed ones are not.
+    looked_up.clear()
+    monkeypatch.setattr(bf, "list_users_full", lambda: [{"userId": "1", "addressWork_City": "Gray"}])
+    assert bf.get_user_origins_bulk([1, 3]) == {1: "Gray", 3: "3 Elm St"}
+    assert looked_up == ["3"]
+
+    bfi.origin_cache.clear()
+
+
+def test_assignments_today_queries_the_current_day(monkeypatch):
+    from datetime import date
+
+    bf = BlueFolderIntegration(object())
+    queried = []
+
+    def fake_assignments(user_id, start_date, end_date, date_range_type):
+        queried.append((start_date, end_date))
+        return []
+
+    monkeypatch.setattr(bf, "_safe_assignments_for_user", fake_assignments)
+
+    assert bf.get_user_assignments_today(7) == []
+    assert bf.get_user_assignments_range(7, start_date="2025.01.06 12:00 AM", end_date="2025.01.06 11:59 PM") == []
+
+    today = date.today().strftime("%Y.%m.%d")
+    assert queried == [
+        (f"{today} 12:00 AM", f"{today} 11:59 PM"),
+        ("2025.01.06 12:00 AM", "2025.01.06 11:59 PM"),
+    ]
+
+
+def test_update_user_custom_fields_bulk_writes_each_user():
+    payloads = []
+
+    class Users:
+        def update(self, payload):
+            payloads.append(payload)
+            return "ok"
+
+    bf = BlueFolderIntegration(type("C", (), {"users": Users()})())
+    results = bf.update_user_custom_fields_bulk({1: "https://a", 2: "https://b"}, field_name="RouteURL")
+
+    assert results == {1: "ok", 2: "ok"}
+    written = sorted((p["userId"], p["CustomFields"]["CustomField"]["Value"]) for p in payloads)
+    assert written == [(1, "https://a"), (2, "https://b")]
+
+
+def test_get_active_user_indexes_active_list(monkeypatch):
+    bf = BlueFolderIntegration(object())
+    users = [{"userId": "1"}, {"userId": "2"}]
+    monkeypatch.setattr(bf, "get_active_users", lambda: users)
+
+    assert bf.get_active_user(2) == {"userId": "2"}
+    assert bf.get_active_user("1") == {"userId": "1"}
+    assert bf.get_active_user(3) is None
@@ -0,0 +1,263 @@
+from optimized_routing.utils import cache_manager
+from optimized_routing.utils.cache_manager import CacheManager
+
+
+def test_deferred_set_persists_on_flush(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("deferred")
+
+    cache.set("a", {"x": 1}, flush=False)
+    cache.set("b", [1, 2], flush=False)
+    assert not cache.file_path.exists()
+
+    cache.flush()
+    reloaded = CacheManager("deferred")
+    assert reloaded.get("a") == {"x": 1}
+    assert reloaded.get("b") == [1, 2]
+
+
+def test_set_many_writes_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("bulk")
+
+    writes = []
+    original_append = cache._append
+    monkeypatch.setattr(cache, "_append", lambda entries: (writes.append(1), original_append(entries)))
+
+    cache.set_many({"a": 1, "b": 2, "c": 3})
+
+    assert len(writes) == 1
+    assert CacheManager("bulk").get("c") == 3
+
+
+def test_set_appends_to_log_and_compacts(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("log")
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert not cache.file_path.exists()
+    assert len(cache.log_path.read_bytes().splitlines()) == 2
+    assert CacheManager("log").get("b") == 2
+
+    monkeypatch.setattr(cache_manager, "COMPACT_LOG_BYTES", 10)
+    cache.set("c", "x" * 20)
+    assert cache.file_path.exists()
+    assert not cache.log_path.exists()
+    reloaded = CacheManager("log")
+    assert (reloaded.get("a"), reloaded.get("c")) == (1, "x" * 20)
+
+
+def test_load_skips_torn_log_line(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("torn")
+    cache.set("a", 1)
+    with cache.log_path.open("ab") as fp:
+        fp.write(b'{"k":"b","t":')
+
+    assert CacheManager("torn").get("a") == 1
+
+
+def test_snapshot_loads_through_mmap_with_orjson(monkeypatch, tmp_path):
+    import json
+    from types import SimpleNamespace
+
+    seen = []
+
+    def fake_loads(blob):
+        seen.append(type(blob))
+        return json.loads(bytes(blob))
+
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache_manager, "MMAP_MIN_BYTES", 1)
+    monkeypatch.setattr(
+        cache_manager,
+        "orjson",
+        SimpleNamespace(loads=fake_loads, dumps=lambda obj: json.dumps(obj).encode()),
+    )
+    cache = CacheManager("mapped")
+    cache.set("a", [1, 2], flush=False)
+    cache.flush()
+
+    assert CacheManager("mapped").get("a") == [1, 2]
+    assert memoryview in seen
+
+    cache.file_path.write_bytes(b"")
+    assert CacheManager("mapped").data == {}
+
+
+def test_expired_get_defers_save_until_next_set(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("expiry", ttl_minutes=1)
+    cache.set_many({"old": 1, "other": 2})
+    cache.data["old"] = (0, 1)
+
+    saves = []
+    original_save = cache._save
+    monkeypatch.setattr(cache, "_save", lambda: (saves.append(1), original_save()))
+
+    assert cache.get("old") is None
+    assert cache.get("old") is None
+    assert saves == []
+
+    cache.set("new", 3)
+    assert saves == [1]
+    reloaded = CacheManager("expiry")
+    assert "old" not in reloaded.data
+    assert (reloaded.get("other"), reloaded.get("new")) == (2, 3)
+
+
+def test_failed_save_keeps_previous_snapshot(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("atomic")
+    cache.set("a", 1, flush=False)
+    cache.flush()
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    cache.set("b", 2, flush=False)
+    monkeypatch.setattr(cache_manager, "FSYNC_SNAPSHOTS", True)
+    monkeypatch.setattr(cache_manager.os, "fsync", failing_fsync)
+    cache.flush()
+
+    assert CacheManager("atomic").data.keys() == {"a"}
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_snapshot_skips_fsync_by_default(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    synced = []
+    monkeypatch.setattr(cache_manager.os, "fsync", synced.append)
+    cache = CacheManager("nosync")
+    cache.set("a", 1, flush=False)
+    cache.flush()
+
+    assert synced == []
+    assert CacheManager("nosync").get("a") == 1
+
+
+def test_small_snapshot_is_read_without_mmap(monkeypatch, tmp_path):
+    import json
+    from types import SimpleNamespace
+
+    seen = []
+
+    def fake_loads(blob):
+        seen.append(type(blob))
+        return json.loads(bytes(blob))
+
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(
+        cache_manager,
+        "orjson",
+        SimpleNamespace(loads=fake_loads, dumps=lambda obj: json.dumps(obj).encode()),
+    )
+    cache = CacheManager("small")
+    cache.set("a", 1, flush=False)
+    cache.flush()
+
+    assert CacheManager("small").get("a") == 1
+    assert seen == [bytes]
+
+
+def test_compaction_drops_expired_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("sweep", ttl_minutes=1)
+    cache.set_many({"stale": 1, "fresh": 2})
+    cache.data["stale"] = (0, 1)
+
+    cache._save()
+
+    assert set(cache.data) == {"fresh"}
+    assert set(CacheManager("sweep").data) == {"fresh"}
+
+
+def test_get_many_returns_fresh_hits_and_evicts_expired(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("many", ttl_minutes=1)
+    cache.set_many({"a": 1, "b": 2, "old": 3})
+    cache.data["old"] = (0, 3)
+
+    assert cache.get_many(["a", "b", "old", "missing"]) == {"a": 1, "b": 2}
+    assert "old" not in cache.data
+    assert cache._dirty
+
+
+def test_save_encodes_outside_lock_and_keeps_concurrent_appends(monkeypatch, tmp_path):
+    import threading
+
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("cow")
+    cache.set("k", 1)
+    cache.set("k", 2, flush=False)
+
+    original_dumps = cache_manager._dumps
+
+    def dumps_with_concurrent_set(obj):
+        if "t" not in obj and "late" not in obj:  # the snapshot, not a log record
+            writer = threading.Thread(target=cache.set, args=("late", 3))
+            writer.start()
+            writer.join(timeout=2)
+            assert not writer.is_alive()
+        return original_dumps(obj)
+
+    monkeypatch.setattr(cache_manager, "_dumps", dumps_with_concurrent_set)
+    cache.flush()
+
+    assert not cache.compacting_path.exists()
+    reloaded = CacheManager("cow")
+    # The pre-snapshot "k": 1 log line must not replay over the snapshot's 2.
+    assert (reloaded.get("k"), reloaded.get("late")) == (2, 3)
+
+
+def test_failed_compaction_log_replays_before_live_log(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("rotate")
+    cache.set("k", 1)
+    cache.set("k", 2, flush=False)
+
+    original_dumps = cache_manager._dumps
+
+    def failing_snapshot_dumps(obj):
+        if "t" not in obj:
+            raise OSError("disk full")
+        return original_dumps(obj)
+
+    monkeypatch.setattr(cache_manager, "_dumps", failing_snapshot_dumps)
+    cache.flush()
+    assert cache.compacting_path.exists()
+    cache._append({"k": (cache_manager.time.time(), 3)})
+
+    # Nothing was snapshotted: the rotated log ("k": 1) replays, then the live log ("k": 3).
+    assert CacheManager("rotate").get("k") == 3
+
+
+def test_snapshot_is_bare_entries_and_legacy_envelope_still_loads(monkeypatch, tmp_path):
+    import json
+
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("bare")
+    cache.set("a", {"data": 1}, flush=False)
+    cache.flush()
+    assert set(json.loads(cache.file_path.read_bytes())) == {"a"}
+    assert CacheManager("bare").get("a") == {"data": 1}
+
+    now = cache.data["a"][0]
+    cache.file_path.write_text(json.dumps({"data": {"b": [now, 2]}, "timestamp": now}))
+    assert CacheManager("bare").get("b") == 2
+
+
+def test_exit_hook_flushes_live_caches_without_pinning_them(monkeypatch, tmp_path):
+    import gc
+
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", tmp_path)
+    cache = CacheManager("atexit")
+    cache.set("a", 1, flush=False)
+
+    cache_manager._flush_all()
+    assert CacheManager("atexit").get("a") == 1
+
+    del cache
+    gc.collect()
+    assert all(c.name != "atexit" for c in cache_manager._INSTANCES)
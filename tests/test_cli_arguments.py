@@ -29,7 +29,9 @@ def test_cli_origin_override():
     with patch("optimized_routing.main.BlueFolderIntegration") as MockBF:
         inst = MockBF.return_value
         inst.get_active_users.return_value = [{"userId": "12345"}]
+        inst.get_active_user.return_value = {"userId": "12345"}
         inst.get_user_origin_address.return_value = None
+        inst.get_user_origins_bulk.return_value = {}
 
         main.settings.default_provider = "geoapify"
         with patch("optimized_routing.main.generate_route_for_provider") as mock_gen:
@@ -51,7 +53,9 @@ def test_cli_destination_override():
     with patch("optimized_routing.main.BlueFolderIntegration") as MockBF:
         inst = MockBF.return_value
         inst.get_active_users.return_value = [{"userId": "12345"}]
+        inst.get_active_user.return_value = {"userId": "12345"}
         inst.get_user_origin_address.return_value = None
+        inst.get_user_origins_bulk.return_value = {}
 
         main.settings.default_provider = "geoapify"
         with patch("optimized_routing.main.generate_route_for_provider") as mock_gen:
@@ -73,7 +77,9 @@ def test_cli_both_origin_and_destination():
     with patch("optimized_routing.main.BlueFolderIntegration") as MockBF:
         inst = MockBF.return_value
         inst.get_active_users.return_value = [{"userId": "12345"}]
+        inst.get_active_user.return_value = {"userId": "12345"}
         inst.get_user_origin_address.return_value = None
+        inst.get_user_origins_bulk.return_value = {}
 
         main.settings.default_provider = "geoapify"
         with patch("optimized_routing.main.generate_route_for_provider") as mock_gen:
@@ -134,7 +140,9 @@ def test_cli_relative_monday_sets_dates():
     with patch("optimized_routing.main.BlueFolderIntegration") as MockBF:
         inst = MockBF.return_value
         inst.get_active_users.return_value = [{"userId": "12345"}]
+        inst.get_active_user.return_value = {"userId": "12345"}
         inst.get_user_origin_address.return_value = None
+        inst.get_user_origins_bulk.return_value = {}
         inst.get_user_assignments_range.return_value = [{"serviceRequestId": "1"}]
 
         with patch("optimized_routing.main.generate_route_for_provider") as mock_gen:
@@ -147,3 +155,49 @@ def test_cli_relative_monday_sets_dates():
         inst.get_user_assignments_range.assert_called_with(
             12345, start_date=expected_start, end_date=expected_end, date_range_type="scheduled"
         )
+
+
+def test_run_without_date_resolves_today_once_for_every_user():
+    """With no --date, one today range is resolved up front and reused for each user."""
+    with patch("optimized_routing.main.BlueFolderIntegration") as MockBF, patch(
+        "optimized_routing.main.resolve_relative_date", wraps=main.resolve_relative_date
+    ) as resolve:
+        inst = MockBF.return_value
+        inst.get_active_users.return_value = [{"userId": str(i)} for i in range(1, 4)]
+        inst.get_user_origins_bulk.return_value = {}
+        inst.get_user_assignments_range.return_value = []
+
+        main.run_daily_routing(provider="geoapify", dry_run=True, max_workers=3)
+
+    resolve.assert_called_once_with("today")
+    start, end = main.resolve_relative_date("today")
+    ranges = {
+        (call.kwargs["start_date"], call.kwargs["end_date"])
+        for call in inst.get_user_assignments_range.call_args_list
+    }
+    assert inst.get_user_assignments_range.call_count == 3
+    assert ranges == {(start, end)}
+
+
+def test_full_run_processes_every_user_concurrently():
+    """A full run should route each active user exactly once."""
+    with patch("optimized_routing.main.BlueFolderIntegration") as MockBF:
+        inst = MockBF.return_value
+        inst.get_active_users.return_value = [{"userId": str(i)} for i in range(1, 6)]
+        inst.get_user_origin_address.return_value = None
+        inst.get_user_origins_bulk.return_value = {}
+        inst.get_user_assignments_range.return_value = [{"serviceRequestId": "1"}]
+
+        with patch("optimized_routing.main.generate_route_for_provider") as mock_gen, patch(
+            "optimized_routing.main.shorten_route_urls",
+            side_effect=lambda urls: {url: f"short-{url}" for url in urls},
+        ):
+            mock_gen.side_effect = lambda provider, uid, **kw: f"route-{uid}"
+
+            main.run_daily_routing(provider="geoapify", dry_run=False, max_workers=3)
+
+        routed = sorted(call.args[1] for call in mock_gen.call_args_list)
+        assert routed == [1, 2, 3, 4, 5]
+        inst.update_user_custom_fields_bulk.assert_called_once()
+        updates = inst.update_user_custom_fields_bulk.call_args.args[0]
+        assert updates == {i: f"short-route-{i}" for i in range(1, 6)}
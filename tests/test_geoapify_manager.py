@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from optimized_routing.manager.geoapify_manager import GeoapifyRoutingManager
@@ -101,3 +103,342 @@ def test_geoapify_optimizes_within_window(monkeypatch):
     assert "loc=44.0,-70.0" in url.split("&")[0]
     assert "loc=44.3,-70.3" in url
     assert url.count("loc=") == 5  # origin + 3 stops + destination(origin)
+
+
+def test_geoapify_geocodes_each_address_once(monkeypatch):
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    mgr.add_stops(
+        [
+            RouteStop(address="A", window=ServiceWindow.AM),
+            RouteStop(address="B", window=ServiceWindow.PM),
+        ]
+    )
+
+    calls = []
+
+    def fake_geocode(addr):
+        calls.append(addr)
+        return (0.0, 0.0)
+
+    monkeypatch.setattr(mgr, "_geocode", fake_geocode)
+
+    url = mgr.build_route_url()
+
+    assert url.count("loc=") == 4  # origin + 2 stops + destination(origin)
+    assert sorted(calls) == ["A", "B", "Origin, ME"]
+
+
+def test_geoapify_geocode_uses_shared_session(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "get", lambda key: None)
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "set", lambda key, value: None)
+
+    class Resp:
+        status_code = 200
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"results": [{"lon": -70.1, "lat": 44.1}]}
+
+    calls = []
+
+    with GeoapifyRoutingManager(origin="Origin, ME") as mgr:
+        monkeypatch.setattr(mgr._http, "get", lambda url, **kw: calls.append(url) or Resp())
+        assert mgr._geocode("1 Main St") == (-70.1, 44.1)
+
+    assert calls == [GeoapifyRoutingManager.GEOCODE_URL]
+    # Managers share one pool, and closing one leaves it open for the rest.
+    assert GeoapifyRoutingManager(origin="Origin, ME")._http is mgr._http is geoapify_manager._SESSION
+
+
+def test_geoapify_geocode_leaves_retries_to_the_session(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "get", lambda key: None)
+    monkeypatch.setattr(geoapify_manager.time, "sleep", lambda s: pytest.fail("unexpected sleep"))
+
+    class Resp:
+        status_code = 503
+
+        def raise_for_status(self):
+            raise RuntimeError("503 Service Unavailable")
+
+    calls = []
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    monkeypatch.setattr(mgr._http, "get", lambda url, **kw: calls.append(url) or Resp())
+
+    # The session's urllib3 Retry has already backed off by the time a 5xx surfaces.
+    assert mgr._geocode("1 Main St") is None
+    assert len(calls) == 1
+
+
+def test_geoapify_matrix_fails_fast_on_client_error(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    monkeypatch.setattr(geoapify_manager.time, "sleep", lambda s: pytest.fail("unexpected sleep"))
+
+    class Resp:
+        ok = False
+        status_code = 400
+        text = "bad request"
+
+    calls = []
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    monkeypatch.setattr(mgr._http, "post", lambda url, **kw: calls.append(url) or Resp())
+
+    coords = [(float(n), float(n)) for n in range(GeoapifyRoutingManager.LOCAL_ORDER_MAX_STOPS + 1)]
+    assert mgr._optimize_order_geoapify(coords) is None
+    assert len(calls) == 1
+
+
+def test_geoapify_batch_geocode_polls_and_keeps_order(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "get", lambda key: [9.0, 9.0] if key == "cached" else None)
+    stored = {}
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "set_many", stored.update)
+    misses = {}
+    monkeypatch.setattr(geoapify_manager.geocode_miss_cache, "get", lambda key: None)
+    monkeypatch.setattr(geoapify_manager.geocode_miss_cache, "set_many", misses.update)
+    monkeypatch.setattr(geoapify_manager.time, "sleep", lambda s: None)
+
+    class Resp:
+        def __init__(self, status, payload):
+            self.status_code = status
+            self.payload = payload
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return self.payload
+
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    posted = []
+    monkeypatch.setattr(
+        mgr._http,
+        "post",
+        lambda url, json=None, **kw: posted.append(json) or Resp(202, {"id": "job-1"}),
+    )
+    polls = iter(
+        [
+            Resp(202, {"id": "job-1", "status": "pending"}),
+            Resp(200, [{"lon": 1.0, "lat": 1.5}, {"query": {"text": "B"}}]),
+        ]
+    )
+    monkeypatch.setattr(mgr._http, "get", lambda url, **kw: next(polls))
+
+    assert mgr._geocode_batch(["A", "Cached", "B"]) == [(1.0, 1.5), (9.0, 9.0), None]
+    assert posted == [["A", "B"]]
+    assert stored == {"a": [1.0, 1.5]}
+    assert misses == {"b": True}
+
+
+def test_geoapify_batch_failure_falls_back_to_single_lookups(monkeypatch):
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    addresses = [f"{n} Main St" for n in range(GeoapifyRoutingManager.BATCH_MIN_ADDRESSES)]
+
+    def broken_batch(addrs):
+        raise TimeoutError("job stuck")
+
+    monkeypatch.setattr(mgr, "_geocode_batch", broken_batch)
+    monkeypatch.setattr(mgr, "_geocode", lambda addr: (0.0, 0.0))
+
+    coords = mgr._geocode_many(addresses)
+
+    assert list(coords) == addresses
+    assert set(coords.values()) == {(0.0, 0.0)}
+
+
+def test_geoapify_optimizes_each_window_independently(monkeypatch):
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    mgr.add_stops(
+        [RouteStop(address=f"AM{n}", window=ServiceWindow.AM) for n in range(3)]
+        + [RouteStop(address=f"PM{n}", window=ServiceWindow.PM) for n in range(3)]
+    )
+
+    monkeypatch.setattr(mgr, "_geocode", lambda addr: (float(len(addr)), 0.0))
+    seen = []
+
+    def fake_optimize(coords):
+        seen.append(len(coords))
+        return [2, 1, 0]
+
+    monkeypatch.setattr(mgr, "_optimize_order_geoapify", fake_optimize)
+
+    url = mgr.build_route_url()
+
+    assert seen == [3, 3]
+    assert url.count("loc=") == 8  # origin + 6 stops + destination(origin)
+
+
+def test_geoapify_nearest_neighbor_order():
+    matrix = [
+        [0, 5, 1, 9],
+        [5, 0, 2, 1],
+        [1, 2, 0, 4],
+        [9, 1, 4, 0],
+    ]
+    assert GeoapifyRoutingManager._nearest_neighbor_order(matrix, 4) == [0, 2, 1, 3]
+
+    unreachable = [[0, None], [None, 0]]
+    assert GeoapifyRoutingManager._nearest_neighbor_order(unreachable, 2) == [0]
+
+
+def test_geoapify_two_opt_untangles_crossing_path():
+    # Points on a line at 0, 1, 2, 3; the path 0 -> 2 -> 1 -> 3 backtracks.
+    pos = [0, 1, 2, 3]
+    matrix = [[abs(a - b) for b in pos] for a in pos]
+
+    assert GeoapifyRoutingManager._two_opt([0, 2, 1, 3], matrix) == [0, 1, 2, 3]
+    assert GeoapifyRoutingManager._two_opt([0, 1, 2, 3], matrix) == [0, 1, 2, 3]
+
+
+def test_geoapify_geocode_memoizes_per_manager(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    lookups = []
+    monkeypatch.setattr(
+        geoapify_manager.geocode_cache,
+        "get",
+        lambda key: lookups.append(key) or [0.0, 0.0],
+    )
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+
+    assert mgr._geocode("Origin, ME") == mgr._geocode("Origin, ME") == (0.0, 0.0)
+    assert lookups == ["origin, me"]
+
+
+def test_geoapify_return_to_origin_reuses_origin_coordinate(monkeypatch):
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    mgr.add_stops([RouteStop(address="A", window=ServiceWindow.AM)])
+
+    calls = []
+    monkeypatch.setattr(mgr, "_geocode", lambda addr: calls.append(addr) or (1.0, 2.0))
+
+    url = mgr.build_route_url()
+
+    assert url.count("loc=2.0,1.0") == 3
+    assert calls.count("Origin, ME") == 1
+
+
+def test_geoapify_decodes_json_with_orjson_when_available(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    class FakeOrjson:
+        @staticmethod
+        def loads(blob):
+            return {"decoded": blob}
+
+    class Resp:
+        content = b"{}"
+
+        def json(self):
+            raise AssertionError("stdlib decoder should not be used")
+
+    monkeypatch.setattr(geoapify_manager, "orjson", FakeOrjson)
+    assert geoapify_manager._decode_json(Resp()) == {"decoded": b"{}"}
+
+
+def test_geoapify_small_window_orders_locally(monkeypatch):
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    monkeypatch.setattr(mgr._http, "post", lambda *a, **kw: pytest.fail("unexpected matrix request"))
+
+    # Start at 0, then the nearest points in sequence: 2 (lon 1), 1 (lon 2), 3 (lon 3).
+    coords = [(-70.0, 44.0), (-68.0, 44.0), (-69.0, 44.0), (-67.0, 44.0)]
+    assert mgr._optimize_order_geoapify(coords) == [0, 2, 1, 3]
+
+
+def test_geoapify_skips_recently_unresolvable_address(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    monkeypatch.setattr(geoapify_manager.geocode_cache, "get", lambda key: None)
+    monkeypatch.setattr(geoapify_manager.geocode_miss_cache, "get", lambda key: key == "nowhere")
+
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    monkeypatch.setattr(mgr._http, "get", lambda *a, **kw: pytest.fail("unexpected geocode request"))
+
+    assert mgr._geocode("Nowhere") is None
+
+
+def test_geoapify_slow_geocodes_do_not_serialize(monkeypatch):
+    import threading
+
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    addresses = ["A", "B", "C"]
+    # Every lookup blocks (as during a backoff) until all three are in flight.
+    barrier = threading.Barrier(len(addresses), timeout=2)
+
+    def blocking_geocode(addr):
+        barrier.wait()
+        return (0.0, 0.0)
+
+    monkeypatch.setattr(mgr, "_geocode", blocking_geocode)
+
+    assert mgr._geocode_many(addresses) == {addr: (0.0, 0.0) for addr in addresses}
+
+
+def test_geoapify_warms_connection_without_api_key(monkeypatch):
+    from optimized_routing.manager import geoapify_manager
+
+    heads = []
+
+    class Session:
+        def head(self, url, **kwargs):
+            heads.append((url, kwargs.get("params")))
+
+    class InlineThread:
+        def __init__(self, target, **kwargs):
+            self.target = target
+
+        def start(self):
+            self.target()
+
+    monkeypatch.setattr(geoapify_manager, "_SESSION", Session())
+    monkeypatch.setattr(geoapify_manager.threading, "Thread", InlineThread)
+
+    # Off by default: building a manager sends nothing.
+    monkeypatch.setattr(geoapify_manager.settings, "geoapify_warmup", False)
+    monkeypatch.setattr(geoapify_manager, "_warmed_up", False)
+    GeoapifyRoutingManager(origin="Origin, ME")
+    assert heads == []
+
+    # Opted in: only the first manager in the process warms up.
+    monkeypatch.setattr(geoapify_manager.settings, "geoapify_warmup", True)
+    GeoapifyRoutingManager(origin="Origin, ME")
+    GeoapifyRoutingManager(origin="Origin, ME")
+
+    assert heads == [(GeoapifyRoutingManager.API_ROOT, None)]
+
+
+def test_geoapify_matrix_order_is_served_from_route_cache(monkeypatch):
+    from optimized_routing.manager import base
+
+    store = {}
+    monkeypatch.setattr(base.route_cache, "get", store.get)
+    monkeypatch.setattr(base.route_cache, "set", store.__setitem__)
+
+    n = GeoapifyRoutingManager.LOCAL_ORDER_MAX_STOPS + 1
+    matrix = [[abs(i - j) for j in range(n)] for i in range(n)]
+
+    class Resp:
+        ok = True
+        status_code = 200
+        content = json.dumps({"times": matrix}).encode()
+
+        def json(self):
+            return {"times": matrix}
+
+    calls = []
+    mgr = GeoapifyRoutingManager(origin="Origin, ME")
+    monkeypatch.setattr(mgr._http, "post", lambda url, **kw: calls.append(url) or Resp())
+
+    coords = [(float(i), 0.0) for i in range(n)]
+    first = mgr._optimize_order_geoapify(coords)
+    second = mgr._optimize_order_geoapify(coords)
+
+    assert first == second == list(range(n))
+    assert len(calls) == 1
@@ -1,19 +1,16 @@
 from optimized_routing.manager.base import RouteStop, ServiceWindow
-from optimized_routing.manager import mapbox_manager, osm_manager
+from optimized_routing.manager import base, mapbox_manager, ors_native_manager, osm_manager
 from optimized_routing import config as routing_config
 
 
 def test_mapbox_window_order(monkeypatch):
     monkeypatch.setattr(routing_config.settings, "mapbox_api_key", "token")
 
-    # Stub geocode to return sequential coords in call order
-    coords = [(i, i) for i in range(10)]
-    call_idx = {"n": 0}
+    # Stub geocode; geocodes run concurrently, so coordinates are keyed by address
+    coords = {"Origin": (0, 0), "AM": (1, 1), "ALL": (2, 2), "PM": (3, 3)}
 
     def fake_geocode(self, address):
-        i = call_idx["n"]
-        call_idx["n"] += 1
-        return coords[i]
+        return coords[address]
 
     monkeypatch.setattr(mapbox_manager.MapboxRoutingManager, "_geocode", fake_geocode)
 
@@ -21,20 +18,19 @@ def test_mapbox_window_order(monkeypatch):
         ok = True
 
         def json(self):
-            # four waypoints: origin + AM + ALL + PM (we don't add destination override)
+            # Origin + AM + ALL + PM + origin again, in input order with
+            # road-snapped locations; the trip keeps that order.
             return {
                 "waypoints": [
-                    {"location": [0, 0]},
-                    {"location": [1, 1]},
-                    {"location": [2, 2]},
-                    {"location": [3, 3]},
+                    {"location": [x + 0.0001, x - 0.0002], "waypoint_index": i}
+                    for i, x in enumerate((0, 1, 2, 3, 0))
                 ]
             }
 
         def raise_for_status(self):
             return None
 
-    monkeypatch.setattr("optimized_routing.manager.mapbox_manager.requests.get", lambda *a, **k: FakeResp())
+    monkeypatch.setattr(mapbox_manager._SESSION, "get", lambda *a, **k: FakeResp())
 
     mgr = mapbox_manager.MapboxRoutingManager(origin="Origin", destination_override=None)
     mgr.add_stops(
@@ -46,10 +42,8 @@ def test_mapbox_window_order(monkeypatch):
     )
 
     url = mgr.build_route_url()
-    # Coordinates appended in call order -> check that AM was geocoded before ALL and PM
-    assert url.startswith("https://www.mapbox.com/directions?coordinates=")
-    # With fake coords, AM -> (0,0), ALL -> (1,1), PM -> (2,2)
-    assert "0,0;1,1;2,2" in url
+    # Waypoints follow window order: Origin, AM, ALL, PM, built from our coordinates.
+    assert url == "https://www.mapbox.com/directions?coordinates=0,0;1,1;2,2;3,3;0,0"
 
 
 def test_osm_window_order(monkeypatch):
@@ -80,3 +74,170 @@ def test_osm_window_order(monkeypatch):
     # OSRM viewer URL should place AM before ALL before PM
     assert url.startswith("https://map.project-osrm.org/?")
     assert url.index("loc=44.1,-70.1") < url.index("loc=44.2,-70.2") < url.index("loc=44.3,-70.3")
+
+
+def test_mapbox_round_trip_geocodes_origin_once(monkeypatch):
+    monkeypatch.setattr(routing_config.settings, "mapbox_api_key", "token")
+
+    calls = []
+
+    def fake_geocode(self, address):
+        calls.append(address)
+        return {"Origin": (0, 0), "Stop": (1, 1)}[address]
+
+    monkeypatch.setattr(mapbox_manager.MapboxRoutingManager, "_geocode", fake_geocode)
+    monkeypatch.setattr(
+        mapbox_manager.MapboxRoutingManager, "_fetch_optimized_order", lambda *a, **k: None
+    )
+    monkeypatch.setattr(base.route_cache, "get", lambda key: None)
+
+    mgr = mapbox_manager.MapboxRoutingManager(origin="Origin")
+    mgr.add_stop(RouteStop("Stop", ServiceWindow.AM))
+
+    url = mgr.build_route_url()
+    assert url.endswith("coordinates=0,0;1,1;0,0")
+    assert calls.count("Origin") == 1
+
+
+def test_osm_batch_build_uses_one_ors_call(monkeypatch):
+    monkeypatch.setenv("ORS_API_KEY", "key")
+    coord_map = {
+        "Depot": [-70.0, 44.0],
+        "A1": [-70.1, 44.1],
+        "A2": [-70.2, 44.2],
+        "B1": [-70.3, 44.3],
+        "B2": [-70.4, 44.4],
+    }
+    monkeypatch.setattr(
+        osm_manager.OSMRoutingManager, "_geocode_address", lambda self, address: coord_map[address]
+    )
+    monkeypatch.setattr(base.route_cache, "get", lambda key: None)
+    monkeypatch.setattr(base.route_cache, "set", lambda key, value: None)
+
+    posts = []
+
+    class FakeResp:
+        ok = True
+
+        def __init__(self, payload):
+            self.payload = payload
+
+        def json(self):
+            # Reverse each vehicle's jobs so the joint order is observable.
+            routes = {}
+            for job in self.payload["jobs"]:
+                routes.setdefault(job["skills"][0], []).insert(0, {"type": "job", "id": job["id"]})
+            return {"routes": [{"vehicle": v, "steps": steps} for v, steps in routes.items()]}
+
+    def fake_post(url, json=None, **kwargs):
+        posts.append(json)
+        return FakeResp(json)
+
+    monkeypatch.setattr(osm_manager._SESSION, "post", fake_post)
+
+    managers = []
+    for stops in (["A1", "A2"], ["B1", "B2"]):
+        mgr = osm_manager.OSMRoutingManager(origin="Depot")
+        mgr.add_stops([RouteStop(addr, ServiceWindow.AM) for addr in stops])
+        managers.append(mgr)
+    # A technician with nothing to route must not sink the rest of the batch.
+    managers.append(osm_manager.OSMRoutingManager(origin="Depot"))
+
+    first, second, empty = osm_manager.batch_build(managers)
+
+    assert empty is None
+    assert len(posts) == 1
+    assert len(posts[0]["vehicles"]) == 2
+    assert first.index("loc=44.2,-70.2") < first.index("loc=44.1,-70.1")
+    assert second.index("loc=44.4,-70.4") < second.index("loc=44.3,-70.3")
+    assert "44.3" not in first and "44.1" not in second
+
+
+def test_trivial_routes_skip_optimization(monkeypatch):
+    monkeypatch.setattr(routing_config.settings, "mapbox_api_key", "token")
+    monkeypatch.setattr(
+        mapbox_manager.MapboxRoutingManager,
+        "_geocode",
+        lambda self, address: {"Origin": (0, 0), "Stop": (1, 1)}[address],
+    )
+    monkeypatch.setattr(
+        osm_manager.OSMRoutingManager,
+        "_geocode_address",
+        lambda self, address: {"Origin": [0.0, 0.0], "Stop": [1.0, 1.0]}[address],
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("optimization should be skipped for a single stop")
+
+    monkeypatch.setattr(mapbox_manager.MapboxRoutingManager, "_fetch_optimized_order", fail)
+    monkeypatch.setattr(osm_manager.OSMRoutingManager, "_optimize_order", fail)
+
+    for manager_cls in (mapbox_manager.MapboxRoutingManager, osm_manager.OSMRoutingManager):
+        mgr = manager_cls(origin="Origin")
+        mgr.add_stop(RouteStop("Stop", ServiceWindow.AM))
+        assert mgr.build_route_url()
+
+    monkeypatch.setattr(
+        ors_native_manager.ORSNativeRoutingManager,
+        "_geocode",
+        lambda self, address: {"Origin": [0.0, 0.0], "Stop": [1.0, 1.0]}[address],
+    )
+    monkeypatch.setattr(ors_native_manager.ORSNativeRoutingManager, "_optimize", fail)
+    ors = ors_native_manager.ORSNativeRoutingManager(origin="Origin")
+    ors.add_stops([RouteStop("Stop", ServiceWindow.AM)])
+    assert ors.build_route_url().endswith("/0.0,0.0/1.0,1.0/driving-car")
+
+
+def test_mapbox_splits_long_routes_into_optimizable_segments(monkeypatch):
+    monkeypatch.setattr(routing_config.settings, "mapbox_api_key", "token")
+    monkeypatch.setattr(base.route_cache, "get", lambda key: None)
+    monkeypatch.setattr(base.route_cache, "set", lambda key, value: None)
+
+    requested = []
+
+    class FakeResp:
+        def __init__(self, points):
+            self.points = points
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            # Input order, snapped locations; the trip reverses the movable middle.
+            n = len(self.points)
+            positions = [0, *range(n - 2, 0, -1), n - 1]
+            return {
+                "waypoints": [
+                    {"location": [float(p.split(",")[0]) + 0.0003, 7.5], "waypoint_index": positions[i]}
+                    for i, p in enumerate(self.points)
+                ]
+            }
+
+    def fake_get(url, timeout=None):
+        points = url.split("/")[-1].split("?")[0].split(";")
+        requested.append(points)
+        return FakeResp(points)
+
+    monkeypatch.setattr(mapbox_manager._SESSION, "get", fake_get)
+
+    mgr = mapbox_manager.MapboxRoutingManager(origin="Origin")
+    waypoints = [f"{i},{i}" for i in range(15)]
+    result = mgr._optimize_waypoints(waypoints)
+
+    assert all(len(points) <= mgr.MAX_OPTIMIZE_WAYPOINTS for points in requested)
+    assert len(requested) == 2
+    # Results are our input strings, reordered, never the snapped locations.
+    assert result == [*(f"{i},{i}" for i in [0, *range(10, 0, -1), 11, 13, 12, 14])]
+    assert mgr._optimize_waypoints(waypoints[:6]) == ["0,0", "4,4", "3,3", "2,2", "1,1", "5,5"]
+
+
+def test_mapbox_rejects_order_that_moves_pinned_endpoints(monkeypatch):
+    monkeypatch.setattr(routing_config.settings, "mapbox_api_key", "token")
+    monkeypatch.setattr(base.route_cache, "get", lambda key: None)
+    monkeypatch.setattr(base.route_cache, "set", lambda key, value: None)
+    monkeypatch.setattr(
+        mapbox_manager.MapboxRoutingManager, "_fetch_optimized_order", lambda self, coords: [1, 0, 2, 3]
+    )
+
+    mgr = mapbox_manager.MapboxRoutingManager(origin="Origin")
+    assert mgr._optimize_waypoints(["0,0", "1,1", "2,2", "3,3"]) is None
@@ -40,3 +40,26 @@ def test_osm_provider_does_not_require_key(monkeypatch):
     monkeypatch.setattr("optimized_routing.manager.osm_manager.OSMRoutingManager._optimize_order", lambda self, coords: None)
     url = generate_route_for_provider("osm", 1, origin_address="Start")
     assert "map.project-osrm.org" in url
+
+
+@pytest.mark.parametrize("value, ok", [("6", True), ("0", False), ("-2", False)])
+def test_routing_concurrency_is_read_per_settings_and_must_be_positive(value, ok):
+    # conftest stubs pydantic in-process; validate against the real one in a child interpreter.
+    import os
+    import subprocess
+    import sys
+
+    pytest.importorskip("pydantic")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-c", "from optimized_routing.config import Settings; print(Settings().routing_concurrency)"],
+        cwd=root,
+        env={**os.environ, "ROUTING_CONCURRENCY": value},
+        capture_output=True,
+        text=True,
+    )
+
+    if ok:
+        assert proc.stdout.strip() == value
+    else:
+        assert proc.returncode != 0 and "greater than 0" in proc.stderr
@@ -42,3 +42,34 @@ def test_bluefolder_safe_gives_up_after_retry_budget(monkeypatch):
 
     assert always_limited() is None
     assert len(sleeps) == 5
+
+
+def test_bluefolder_safe_backs_off_on_transient_errors(monkeypatch):
+    calls = {"count": 0}
+    sleeps: list[float] = []
+    monkeypatch.setattr("optimized_routing.bluefolder_integration.time.sleep", lambda seconds: sleeps.append(seconds))
+
+    @bluefolder_safe
+    def flaky():
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise ConnectionError("reset by peer")
+        if calls["count"] == 2:
+            raise HTTPError(response=_Response(503, "unavailable"))
+        return "ok"
+
+    assert flaky() == "ok"
+    assert calls["count"] == 3
+    assert len(sleeps) == 2
+
+
+def test_bluefolder_safe_gives_up_after_transient_budget(monkeypatch):
+    sleeps: list[float] = []
+    monkeypatch.setattr("optimized_routing.bluefolder_integration.time.sleep", lambda seconds: sleeps.append(seconds))
+
+    @bluefolder_safe
+    def always_down():
+        raise ConnectionError("down")
+
+    assert always_down() is None
+    assert len(sleeps) == 3
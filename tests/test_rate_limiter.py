@@ -0,0 +1,49 @@
+from optimized_routing.utils import rate_limiter
+from optimized_routing.utils.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_paces(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    waits = []
+
+    def fake_wait(timeout):
+        waits.append(timeout)
+        clock.now += timeout
+
+    monkeypatch.setattr(bucket._cond, "wait", fake_wait)
+
+    bucket.acquire()
+    bucket.acquire()
+    assert waits == []
+
+    bucket.acquire()
+    assert waits == [0.5]
+
+
+def test_penalize_halves_refill_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    bucket = TokenBucket(rate=4, capacity=1)
+    waits = []
+
+    def fake_wait(timeout):
+        waits.append(timeout)
+        clock.now += timeout
+
+    monkeypatch.setattr(bucket._cond, "wait", fake_wait)
+
+    bucket.acquire()
+    bucket.penalize(seconds=60)
+    bucket.acquire()
+    assert waits == [0.5]
@@ -37,3 +37,123 @@ def test_generate_route_for_provider_geoapify(monkeypatch):
 
     url = generate_route_for_provider("geoapify", 1, origin_address="Origin")
     assert url == "geo://route"
+
+
+def test_bluefolder_to_routestops_keeps_earliest_window_per_request():
+    from optimized_routing.manager.base import ServiceWindow
+    from optimized_routing.routing import bluefolder_to_routestops
+
+    base = {"address": "123 Main", "city": "Town", "state": "ME", "zip": "04000"}
+    stops = bluefolder_to_routestops(
+        [
+            {**base, "serviceRequestId": "1", "start": "2024-01-01T13:00:00"},
+            {**base, "serviceRequestId": "2", "address": "9 Elm", "start": "2024-01-01T14:00:00"},
+            {**base, "serviceRequestId": "1", "start": "2024-01-01T08:00:00"},
+        ]
+    )
+
+    assert [(s.label, s.window) for s in stops] == [
+        ("SR-1", ServiceWindow.AM),
+        ("SR-2", ServiceWindow.PM),
+    ]
+
+
+def test_dedupe_stops_keeps_first_occurrence():
+    from optimized_routing.manager.base import RouteStop, ServiceWindow
+    from optimized_routing.routing import dedupe_stops
+
+    first = RouteStop("1 Main St", ServiceWindow.AM, label="SR-1")
+    stops = [
+        first,
+        RouteStop("2 Oak St", ServiceWindow.PM, label="SR-1"),
+        RouteStop(" 3 Elm St ", ServiceWindow.PM),
+        RouteStop("3 elm st", ServiceWindow.AM),
+    ]
+
+    unique = dedupe_stops(stops)
+
+    assert unique == [first, stops[2]]
+
+
+def test_bluefolder_to_unique_routestops_matches_two_step_pipeline():
+    from optimized_routing.routing import (
+        bluefolder_to_routestops,
+        bluefolder_to_unique_routestops,
+        dedupe_stops,
+    )
+
+    base = {"city": "Town", "state": "ME", "zip": "04000"}
+    assignments = [
+        {**base, "serviceRequestId": "1", "address": "1 Main", "start": "2024-01-01T13:00:00"},
+        {**base, "serviceRequestId": "2", "address": "2 Oak", "start": "bogus"},
+        {**base, "serviceRequestId": "1", "address": "1 Main", "start": "2024-01-01T08:00:00"},
+        {**base, "serviceRequestId": "3", "address": "3 Elm", "start": "2024-01-01T09:00:00"},
+        {**base, "serviceRequestId": "2", "address": "2 Oak", "start": "2024-01-01T15:00:00"},
+    ]
+
+    assert bluefolder_to_unique_routestops(assignments) == dedupe_stops(
+        bluefolder_to_routestops(assignments)
+    )
+
+
+@pytest.mark.parametrize(
+    "start, expected",
+    [
+        ("2024-01-01T08:00:00", "AM"),
+        ("2024-01-01 13:30:00", "PM"),
+        ("2024-01-01T18:00:00-05:00", "ALL_DAY"),
+        ("2024-01-01", "AM"),
+        ("2024-01-01T14:05Z", "PM"),
+        # BlueFolder's 12-hour format is not ISO; its hour digits must not be read as 24-hour.
+        ("2025.01.06 01:00 PM", "ALL_DAY"),
+        ("2025.01.06 12:30 AM", "ALL_DAY"),
+        ("bogus", "ALL_DAY"),
+        ("", "ALL_DAY"),
+        (None, "ALL_DAY"),
+    ],
+)
+def test_determine_service_window(start, expected):
+    from optimized_routing.manager.base import ServiceWindow
+    from optimized_routing.routing import determine_service_window
+
+    assert determine_service_window(start) is ServiceWindow[expected]
+
+
+def test_bluefolder_to_routestops_skips_missing_address_parts():
+    from optimized_routing.routing import bluefolder_to_routestops
+
+    stops = bluefolder_to_routestops(
+        [
+            {"serviceRequestId": "1", "address": "1 Main", "city": "", "state": "ME", "zip": "04000"},
+            {"serviceRequestId": "2", "address": "2 Oak", "city": "Town", "state": "", "zip": ""},
+        ]
+    )
+
+    assert [s.address for s in stops] == ["1 Main, ME 04000", "2 Oak, Town"]
+
+
+def test_generate_route_for_provider_requires_provider_key(monkeypatch):
+    from optimized_routing import routing
+
+    monkeypatch.setattr(routing.settings, "mapbox_api_key", None)
+    with pytest.raises(ValueError, match="MAPBOX_API_KEY"):
+        generate_route_for_provider("MapBox", 1, bf=DummyIntegration())
+
+
+def test_default_integration_is_reused_across_calls(monkeypatch):
+    from optimized_routing import routing
+
+    created = []
+
+    class CountingIntegration(DummyIntegration):
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr("optimized_routing.routing.BlueFolderIntegration", CountingIntegration)
+    monkeypatch.setattr(routing.settings, "mapbox_api_key", None)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            generate_route_for_provider("mapbox", 1)
+
+    assert len(created) == 1
@@ -20,7 +20,7 @@ def test_shorten_route_url_caches(monkeypatch):
         calls["count"] += 1
         return DummyResp()
 
-    monkeypatch.setattr(routing.requests, "post", fake_post)
+    monkeypatch.setattr(routing._SHORTENER_SESSION, "post", fake_post)
 
     first = routing.shorten_route_url("http://example.com/long")
     second = routing.shorten_route_url("http://example.com/long")
@@ -42,8 +42,56 @@ def test_shorten_route_url_falls_back_when_short_key_is_missing(monkeypatch):
         def json(self):
             return {"unexpected": "payload"}
 
-    monkeypatch.setattr(routing.requests, "post", lambda *a, **k: DummyResp())
+    monkeypatch.setattr(routing._SHORTENER_SESSION, "post", lambda *a, **k: DummyResp())
 
     url = routing.shorten_route_url("http://example.com/long")
 
     assert url == "http://example.com/long"
+
+
+def test_shorten_route_urls_batches_misses_and_dedupes(monkeypatch):
+    routing.short_cache.clear()
+    routing.short_cache.set(routing._short_key("http://example.com/cached"), "https://sho.rt/cached")
+    monkeypatch.setattr(routing.settings, "cf_shortener_url", "https://worker.test")
+
+    posted = []
+
+    class DummyResp:
+        ok = True
+        status_code = 200
+        text = ""
+
+        def __init__(self, url):
+            self.url = url
+
+        def json(self):
+            return {"short": "https://sho.rt/" + self.url.rsplit("/", 1)[-1]}
+
+    def fake_post(url, json=None, timeout=None):
+        posted.append(json["url"])
+        return DummyResp(json["url"])
+
+    monkeypatch.setattr(routing._SHORTENER_SESSION, "post", fake_post)
+
+    result = routing.shorten_route_urls(
+        ["http://example.com/a", "http://example.com/cached", "http://example.com/a", "http://example.com/b"]
+    )
+
+    assert result == {
+        "http://example.com/a": "https://sho.rt/a",
+        "http://example.com/cached": "https://sho.rt/cached",
+        "http://example.com/b": "https://sho.rt/b",
+    }
+    assert sorted(posted) == ["http://example.com/a", "http://example.com/b"]
+    assert routing.short_cache.get(routing._short_key("http://example.com/b")) == "https://sho.rt/b"
+
+
+def test_short_cache_is_keyed_by_digest_not_url(monkeypatch):
+    routing.short_cache.clear()
+    monkeypatch.setattr(routing.settings, "cf_shortener_url", None)
+    monkeypatch.setattr(routing, "CF_SHORTENER_URL", None)
+    long_url = "http://example.com/" + "x" * 4000
+
+    assert routing.shorten_route_url(long_url) == long_url
+    assert list(routing.short_cache.data) == [routing._short_key(long_url)]
+    assert len(routing._short_key(long_url)) < 64
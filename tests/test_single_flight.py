@@ -0,0 +1,31 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from optimized_routing.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow_lookup():
+        calls.append(1)
+        gate.wait(1)
+        return "sr-data"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, ("sr", 7), slow_lookup) for _ in range(4)]
+        time.sleep(0.05)
+        gate.set()
+        results = [f.result() for f in futures]
+
+    assert results == ["sr-data"] * 4
+    assert len(calls) == 1
+
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2